@@ -1,12 +1,21 @@
 import os  
 import ccxt
-import pandas as pd
 import time
 import datetime
 import logging
-import numpy as np
+import argparse
 from retrying import retry
 from logging.handlers import RotatingFileHandler
+from trade_journal import TradeJournal, reconcile
+from order_book import fetch_order_books, execution_price
+from candle_buffer import CandleRingBuffer, ClosedCandles, fetch_into
+from fast_ohlcv import FastKlineClient, fetch_into_fast
+from market_data_bus import attach_reader
+import signal_kernels as kernels
+from risk_engine import RiskEngine
+from order_tracker import OrderTracker
+from strategy_config import ConfigWatcher, candle_capacity
+from sampling_profiler import SamplingProfiler, export_profile
 
 # Setup logging to a rotating file
 handler = RotatingFileHandler('trading_bot.log', maxBytes=5*1024*1024, backupCount=2)
@@ -42,136 +51,359 @@ lookback_period = 14
 rsi_overbought, rsi_oversold = 75, 25
 short_ma_period, long_ma_period = 21, 100
 leverage, balance_cache_duration = 20, 180
+max_group_exposure = 2000  # USDT of open notional per correlated group
+entry_order_ttl = 15 * 60  # Cancel entries still resting after one candle
 current_trade = None
 
 # Initialize cached balance and last fetch time as global variables
 cached_balance = None
 last_balance_fetch_time = None
 
+# Pre-trade limits; symbols in the same group tend to move together
+correlated_groups = {
+    'majors': ['BTC/USDT', 'ETH/USDT'],
+    'layer1': ['SOL/USDT', 'BNB/USDT', 'AVAX/USDT', 'DOT/USDT', 'ADA/USDT', 'TON/USDT'],
+    'alts': ['LINK/USDT', 'XRP/USDT', 'DOGE/USDT', 'RAY/USDT'],
+}
+risk = RiskEngine(limits={'max_notional': 5000, 'max_leverage': leverage}, groups=correlated_groups,
+                  max_group_exposure=max_group_exposure, daily_loss_cap=100, risk_fraction=0.01)
+
+# Crash-safe journal of order intents, acks and balances (replayed on startup)
+journal = TradeJournal(os.getenv('TBOT_JOURNAL_PATH', 'trade_journal.db'))
+
+# Fixed-size candle buffers per symbol, topped up incrementally instead of rebuilt every cycle
+candle_buffers = {}
+
+# Raw kline client decoding straight into the buffers; ccxt stays the fallback path
+kline_client = FastKlineClient()
+
+# Optional shared-memory feed from a local market_data_bus.py feeder (set TBOT_MARKET_BUS to its name)
+market_bus = attach_reader(os.getenv('TBOT_MARKET_BUS'))
+
+# Strategy settings above are the defaults; strategy.toml overrides them and is re-read when it changes
+strategy = ConfigWatcher(os.getenv('TBOT_STRATEGY_PATH', 'strategy.toml'), defaults={
+    'symbols': symbols, 'timeframe': timeframe, 'lookback_period': lookback_period,
+    'rsi_overbought': rsi_overbought, 'rsi_oversold': rsi_oversold,
+    'short_ma_period': short_ma_period, 'long_ma_period': long_ma_period,
+    'leverage': leverage, 'balance_cache_duration': balance_cache_duration,
+    'max_group_exposure': max_group_exposure,
+})
+
+# Function to apply changed strategy settings in place, keeping warmed-up state that is still valid.
+# Indicators are recomputed from the candle buffers each cycle, so only candle state needs care.
+def reload_strategy():
+    global symbols, timeframe, lookback_period, rsi_overbought, rsi_oversold
+    global short_ma_period, long_ma_period, leverage, balance_cache_duration, max_group_exposure
+    changed = strategy.poll()
+    if not changed:
+        return changed
+    config = strategy.config
+    if 'timeframe' in changed:
+        # Candles of the old timeframe are useless for the new one
+        candle_buffers.clear()
+    if 'symbols' in changed:
+        for symbol in set(candle_buffers) - set(config['symbols']):
+            del candle_buffers[symbol]
+    if 'leverage' in changed:
+        risk.set_limits(max_leverage=config['leverage'])
+    if 'max_group_exposure' in changed:
+        risk.max_group_exposure = config['max_group_exposure']
+    symbols = list(config['symbols'])
+    timeframe = config['timeframe']
+    lookback_period = config['lookback_period']
+    rsi_overbought, rsi_oversold = config['rsi_overbought'], config['rsi_oversold']
+    short_ma_period, long_ma_period = config['short_ma_period'], config['long_ma_period']
+    leverage, balance_cache_duration = config['leverage'], config['balance_cache_duration']
+    max_group_exposure = config['max_group_exposure']
+    return changed
+
+reload_strategy()
+
 def fetch_data(symbol, timeframe):
     logging.info(f"Fetching {symbol} data for {timeframe} timeframe...")
+    if market_bus is not None:
+        view = market_bus.candles(symbol, timeframe)
+        if view is not None:
+            return view
     try:
-        bars = exchange.fetch_ohlcv(symbol, timeframe, limit=200)
-        df = pd.DataFrame(bars, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        return df
+        buffer = candle_buffers.get(symbol)
+        if buffer is None:
+            buffer = candle_buffers[symbol] = CandleRingBuffer(candle_capacity)
+        if getattr(exchange, 'id', None) == 'mexc':
+            try:
+                return fetch_into_fast(buffer, kline_client, symbol, timeframe)
+            except Exception as e:
+                logging.warning(f"Fast kline fetch failed for {symbol}, falling back to ccxt: {e}")
+        return fetch_into(buffer, exchange, symbol, timeframe)
     except Exception as e:
         logging.error(f"Error fetching data: {e}")
 
 def calculate_rsi(data, period=14):
-    delta = data['close'].diff(1)
-    gain, loss = delta.clip(lower=0), -delta.clip(upper=0)
-    avg_gain, avg_loss = gain.rolling(window=period).mean(), loss.rolling(window=period).mean()
-    rs = avg_gain / avg_loss
-    data['rsi'] = 100 - (100 / (1 + rs))
-    logging.info(f"RSI calculated: {data['rsi'].iloc[-1]:.2f}")
-    return data
+    rsi = kernels.calculate_rsi(data.view('close'), period)
+    logging.info(f"RSI calculated: {rsi[-1]:.2f}")
+    return rsi
 
 def moving_average_cross(data, short_window=21, long_window=100):
-    data['ma_short'] = data['close'].rolling(window=short_window).mean()
-    data['ma_long'] = data['close'].rolling(window=long_window).mean()
-    
-    if data['ma_long'].isna().all():
+    if len(data) < long_window:
         logging.warning("Insufficient data for MA Long calculation. Waiting for more data points.")
         return None
 
-    if data['ma_short'].iloc[-1] > data['ma_long'].iloc[-1] and data['ma_short'].iloc[-2] <= data['ma_long'].iloc[-2]:
+    signal = kernels.ma_cross_signals(data.view('close'), short_window, long_window)[-1]
+    if signal == 1:
         return 'bullish'
-    elif data['ma_short'].iloc[-1] < data['ma_long'].iloc[-1] and data['ma_short'].iloc[-2] >= data['ma_long'].iloc[-2]:
+    elif signal == -1:
         return 'bearish'
     return None
 
 def identify_range_break(data):
-    high_max = data['high'].rolling(window=20).max()
-    low_min = data['low'].rolling(window=20).min()
-    
-    if data['close'].iloc[-1] > high_max.iloc[-2]:
+    signal = kernels.range_break_signals(data.view('high'), data.view('low'), data.view('close'), 20)[-1]
+    if signal == 1:
         return 'breakout_up'
-    elif data['close'].iloc[-1] < low_min.iloc[-2]:
+    elif signal == -1:
         return 'breakout_down'
     return None
 
 def calculate_atr(data, period=14):
-    high_low = data['high'] - data['low']
-    high_close = np.abs(data['high'] - data['close'].shift())
-    low_close = np.abs(data['low'] - data['close'].shift())
-    tr = high_low.combine(high_close, max).combine(low_close, max)
-    atr = tr.rolling(window=period).mean()
-    data['atr'] = atr
-    return data
-
-def calculate_position_size():
+    return kernels.calculate_atr(data.view('high'), data.view('low'), data.view('close'), period)
+
+def calculate_position_size(symbol, price):
     global cached_balance, last_balance_fetch_time
     current_time = time.time()
     if cached_balance is None or (last_balance_fetch_time is None or (current_time - last_balance_fetch_time) > balance_cache_duration):
         try:
             cached_balance = exchange.fetch_balance()['total']['USDT']
             last_balance_fetch_time = current_time
+            journal.record('balance', balance=cached_balance)
             logging.info(f"Current balance: {cached_balance}")
         except Exception as e:
             logging.error(f"Error fetching balance: {e}")
             return 0
-    return 0.01 * cached_balance
+    risk.set_balance(cached_balance)
+    return risk.position_size(symbol, price, leverage=leverage)
 
-def place_order(symbol, order_type, amount, entry_price, atr_value):
+def place_protective_order(symbol, order_type, amount, stop_loss_price, take_profit_price):
+    exit_side = 'sell' if order_type == 'buy' else 'buy'
+    journal.record('protect_intent', symbol, sync=True, side=exit_side, amount=amount,
+                   stop_loss_price=stop_loss_price, take_profit_price=take_profit_price)
+    protect = exchange.create_order(symbol, 'limit', exit_side, amount, take_profit_price, {'stopPrice': stop_loss_price})
+    journal.record('protect_ack', symbol, order_id=protect['id'])
+    order_tracker.track(protect['id'], symbol, exit_side, amount, kind='protect', entry_side=order_type,
+                        stop_loss_price=stop_loss_price, take_profit_price=take_profit_price)
+    return protect
+
+# Positions whose protective order could not be placed: symbol -> place_protective_order() arguments
+unprotected = {}
+
+# Function to protect a position, queueing it for another attempt next cycle if the order fails
+def protect_position(symbol, order_type, amount, stop_loss_price, take_profit_price):
+    unprotected.pop(symbol, None)
+    try:
+        return place_protective_order(symbol, order_type, amount, stop_loss_price, take_profit_price)
+    except Exception as e:
+        logging.error(f"Failed to place protective order for {symbol}, retrying next cycle: {e}")
+        unprotected[symbol] = (symbol, order_type, amount, stop_loss_price, take_profit_price)
+
+def retry_protection():
+    for args in list(unprotected.values()):
+        protect_position(*args)
+
+# Function to react to order tracker events: protect filled entries, free the slot when a trade ends
+def on_order_event(event, tracked, order):
+    global current_trade
+    symbol, filled = tracked['symbol'], order.get('filled') or 0.0
+    price = order.get('average') or order.get('price') or tracked.get('entry_price')
+    if event == 'partial':
+        logging.info(f"{tracked['kind'].capitalize()} order on {symbol} partly filled: {filled}/{tracked['amount']}")
+        return
+    if tracked['kind'] == 'entry':
+        if event != 'filled' and not filled:
+            logging.info(f"Entry on {symbol} {event} without a fill.")
+            journal.record('closed', symbol, reason=f"entry {event} without fill")
+            current_trade = None
+            return
+        filled = filled or tracked['amount']
+        journal.record('fill', symbol, order_id=tracked['id'], amount=filled, price=price)
+        risk.on_fill(symbol, tracked['side'], filled, price)
+        protect_position(symbol, tracked['side'], filled, tracked['stop_loss_price'], tracked['take_profit_price'])
+    elif event == 'filled':
+        logging.info(f"Protective order on {symbol} executed at {price}. Trade closed.")
+        risk.on_fill(symbol, tracked['side'], filled or tracked['amount'], price)
+        journal.record('closed', symbol, reason='protective order executed')
+        current_trade = None
+    else:
+        # Canceled or rejected outside the bot while the position is still open: protect what is left
+        if filled:
+            risk.on_fill(symbol, tracked['side'], filled, price)
+        remaining = tracked['amount'] - filled
+        if remaining <= tracked['amount'] * 1e-9:
+            journal.record('closed', symbol, reason=f"protective order {event} after filling")
+            current_trade = None
+            return
+        logging.warning(f"Protective order on {symbol} was {event}; re-placing it for {remaining}.")
+        protect_position(symbol, tracked['entry_side'], remaining, tracked['stop_loss_price'], tracked['take_profit_price'])
+
+order_tracker = OrderTracker(exchange, on_order_event)
+
+def place_order(symbol, order_type, amount, entry_price, atr_value, book=None):
     global current_trade
     try:
         if current_trade is None:
+            # Price the entry from the live best bid/ask instead of the last candle close
+            entry_price = execution_price(exchange, symbol, order_type, amount, entry_price, book=book)
             stop_loss_pct, take_profit_pct = atr_value * 0.5, atr_value * 1.5
             logging.info(f"Attempting to place {order_type} order on {symbol} with amount {amount} at {entry_price}...")
-            
+
             if order_type == 'buy':
                 stop_loss_price = entry_price - stop_loss_pct
                 take_profit_price = entry_price + take_profit_pct
-                order = exchange.create_limit_buy_order(symbol, amount, entry_price, {'leverage': leverage})
-                exchange.create_order(symbol, 'limit', 'sell', amount, take_profit_price, {'stopPrice': stop_loss_price})
-                current_trade = symbol
-                logging.info(f"Buy order placed on {symbol} with Stop Loss at {stop_loss_price} and Take Profit at {take_profit_price}")
-            
             elif order_type == 'sell':
                 stop_loss_price = entry_price + stop_loss_pct
                 take_profit_price = entry_price - take_profit_pct
-                order = exchange.create_limit_sell_order(symbol, amount, entry_price, {'leverage': leverage})
-                exchange.create_order(symbol, 'limit', 'buy', amount, take_profit_price, {'stopPrice': stop_loss_price})
-                current_trade = symbol
-                logging.info(f"Sell order placed on {symbol} with Stop Loss at {stop_loss_price} and Take Profit at {take_profit_price}")
+            else:
+                return
+
+            approved, reason = risk.check(symbol, order_type, amount, entry_price, leverage)
+            if not approved:
+                logging.warning(f"Risk check rejected {order_type} {amount} {symbol} at {entry_price}: {reason}")
+                return
+
+            # The intent must be on disk before the exchange can know about the order
+            journal.record('entry_intent', symbol, sync=True, side=order_type, amount=amount, entry_price=entry_price,
+                           stop_loss_price=stop_loss_price, take_profit_price=take_profit_price)
+            try:
+                if order_type == 'buy':
+                    order = exchange.create_limit_buy_order(symbol, amount, entry_price, {'leverage': leverage})
+                else:
+                    order = exchange.create_limit_sell_order(symbol, amount, entry_price, {'leverage': leverage})
+            except Exception as e:
+                journal.record('entry_failed', symbol, reason=str(e))
+                raise
+            journal.record('entry_ack', symbol, order_id=order['id'])
+            current_trade = symbol
+            # Protection is placed by on_order_event once the entry actually fills
+            order_tracker.track(order['id'], symbol, order_type, amount, kind='entry', ttl=entry_order_ttl,
+                                entry_price=entry_price, stop_loss_price=stop_loss_price, take_profit_price=take_profit_price)
+            logging.info(f"{order_type.capitalize()} order placed on {symbol} with Stop Loss at {stop_loss_price} and Take Profit at {take_profit_price}")
     except Exception as e:
         logging.error(f"{order_type.capitalize()} order placement on {symbol} failed: {e}")
 
-def trading_bot():
-    global current_trade
+# Restore journaled state after a restart and re-protect positions left without protective orders
+def recover_state():
+    global current_trade, cached_balance, last_balance_fetch_time
+    logging.info("Reconciling trade journal with the exchange...")
+    state = reconcile(exchange, journal)
+    if state['cached_balance'] is not None:
+        cached_balance = state['cached_balance']
+        last_balance_fetch_time = state['last_balance_fetch_time']
+        risk.set_balance(cached_balance)
+    for trade in state['trades'].values():
+        if trade['protect_order_id'] is not None:
+            risk.on_fill(trade['symbol'], trade['side'], trade['amount'], trade['entry_price'])
+            order_tracker.track(trade['protect_order_id'], trade['symbol'], 'sell' if trade['side'] == 'buy' else 'buy',
+                                trade['amount'], kind='protect', entry_side=trade['side'],
+                                stop_loss_price=trade['stop_loss_price'], take_profit_price=trade['take_profit_price'])
+    if state['trades']:
+        current_trade = next(iter(state['trades']))
+        logging.info(f"Recovered open trade on {current_trade} from journal.")
+    for trade in state['unprotected']:
+        if trade['status'] in ('intent', 'open'):
+            # The tracker reports the entry's fill (or expiry) and protects it then
+            order_tracker.track(trade['entry_order_id'], trade['symbol'], trade['side'], trade['amount'], kind='entry',
+                                ttl=entry_order_ttl, placed_at=trade['intent_ts'], entry_price=trade['entry_price'],
+                                stop_loss_price=trade['stop_loss_price'], take_profit_price=trade['take_profit_price'])
+            continue
+        risk.on_fill(trade['symbol'], trade['side'], trade['amount'], trade['entry_price'])
+        logging.warning(f"Position on {trade['symbol']} has no protective order. Placing it now.")
+        protect_position(trade['symbol'], trade['side'], trade['amount'], trade['stop_loss_price'], trade['take_profit_price'])
+
+# Function to compute the signal inputs on closed candles only; a shared bus view is re-read if the
+# feeder wrote to it meanwhile. The last element is the data_quality issues of the signal bar.
+def read_indicators(symbol, data, attempts=3):
+    for _ in range(attempts):
+        closed = ClosedCandles(data)
+        # The forming candle's close is only used as the live price to size and price the order
+        indicators = (calculate_rsi(closed, lookback_period)[-1], calculate_atr(closed)[-1],
+                      moving_average_cross(closed, short_ma_period, long_ma_period), identify_range_break(closed),
+                      data.view('close')[-1], closed.signal_bar_issues())
+        if not hasattr(data, 'stable') or data.stable():
+            return indicators
+        data = fetch_data(symbol, timeframe)
+        if data is None:
+            return None
+    return None
+
+# Function to run one scan of the watchlist and place orders for any signals
+def run_cycle():
+    if current_trade is not None:
+        logging.info(f"Trade active on {current_trade}. Skipping other symbols.")
+        return
+
+    signals = []
+    for symbol in symbols:
+        data = fetch_data(symbol, timeframe)
+        if data is None:
+            logging.warning(f"No data fetched for {symbol}. Skipping this cycle.")
+            continue
+
+        indicators = read_indicators(symbol, data)
+        if indicators is None:
+            logging.warning(f"Candles for {symbol} kept changing during the read. Skipping this cycle.")
+            continue
+        current_rsi, atr_value, ma_cross, range_break, current_price, issues = indicators
+        if issues:
+            logging.info(f"Last closed {symbol} candle is synthetic, zero-volume or repaired (flags {issues}). Not signalling on it.")
+            continue
+
+        if (range_break == 'breakout_up' or ma_cross == 'bullish') and current_rsi < rsi_oversold:
+            logging.info(f"Buy conditions met for {symbol} (RSI: {current_rsi}, MA Cross: {ma_cross}, Range Break: {range_break})")
+            signals.append((symbol, 'buy', current_price, atr_value))
+        elif (range_break == 'breakout_down' or ma_cross == 'bearish') and current_rsi > rsi_overbought:
+            logging.info(f"Sell conditions met for {symbol} (RSI: {current_rsi}, MA Cross: {ma_cross}, Range Break: {range_break})")
+            signals.append((symbol, 'sell', current_price, atr_value))
+        else:
+            logging.info(f"No trade action for {symbol}. Conditions not met (RSI: {current_rsi}, MA Cross: {ma_cross}, Range Break: {range_break}).")
+
+    if not signals:
+        return
+
+    # One batched order book fetch for every signalling symbol
+    books = fetch_order_books(exchange, [signal[0] for signal in signals])
+    for symbol, order_type, current_price, atr_value in signals:
+        if current_trade is not None:
+            break
+        amount = calculate_position_size(symbol, current_price)
+        place_order(symbol, order_type, amount, current_price, atr_value, books.get(symbol))
+
+def trading_bot(profiler=None, profile_every=10, profile_dir='profiles'):
+    recover_state()
     last_run_time = None
+    cycles = 0
     while True:
         current_time = datetime.datetime.utcnow()
         if last_run_time is None or (current_time - last_run_time).seconds >= 60:
             last_run_time = current_time
-            for symbol in symbols:
-                if current_trade is not None:
-                    logging.info(f"Trade active on {current_trade}. Skipping other symbols.")
-                    break
-
-                data = fetch_data(symbol, timeframe)
-                if data is None:
-                    logging.warning(f"No data fetched for {symbol}. Skipping this cycle.")
-                    continue
-
-                data = calculate_rsi(data, lookback_period)
-                data = calculate_atr(data)
-                ma_cross = moving_average_cross(data)
-                range_break = identify_range_break(data)
-                current_price = data['close'].iloc[-1]
-                current_rsi = data['rsi'].iloc[-1]
-                atr_value = data['atr'].iloc[-1]
-                amount = calculate_position_size() / current_price
-
-                if (range_break == 'breakout_up' or ma_cross == 'bullish') and current_rsi < rsi_oversold:
-                    logging.info(f"Buy conditions met for {symbol} (RSI: {current_rsi}, MA Cross: {ma_cross}, Range Break: {range_break})")
-                    place_order(symbol, 'buy', amount, current_price, atr_value)
-                elif (range_break == 'breakout_down' or ma_cross == 'bearish') and current_rsi > rsi_overbought:
-                    logging.info(f"Sell conditions met for {symbol} (RSI: {current_rsi}, MA Cross: {ma_cross}, Range Break: {range_break})")
-                    place_order(symbol, 'sell', amount, current_price, atr_value)
-                else:
-                    logging.info(f"No trade action for {symbol}. Conditions not met (RSI: {current_rsi}, MA Cross: {ma_cross}, Range Break: {range_break}).")
+            reload_strategy()
+            order_tracker.poll()
+            retry_protection()
+            cycle_started = time.perf_counter()
+            if profiler is not None:
+                profiler.resume()
+            try:
+                run_cycle()
+            finally:
+                if profiler is not None:
+                    profiler.pause()
+            cycles += 1
+            logging.info(f"Cycle {cycles} took {time.perf_counter() - cycle_started:.2f}s")
+            if profiler is not None and cycles % profile_every == 0:
+                export_profile(profiler.snapshot(), profile_dir, f"cycles_{cycles - profile_every + 1:06d}-{cycles:06d}")
 
 if __name__ == "__main__":
-    trading_bot()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="MEXC multi-symbol trading bot.")
+    parser.add_argument('--profile', action='store_true', help="Sample the trading loop and export flame graph stacks")
+    parser.add_argument('--profile-every', type=int, default=10, help="Cycles per exported profile")
+    parser.add_argument('--profile-dir', default='profiles')
+    parser.add_argument('--profile-interval', type=float, default=0.01, help="Seconds between stack samples")
+    args = parser.parse_args()
+    profiler = SamplingProfiler(args.profile_interval) if args.profile else None
+    trading_bot(profiler, args.profile_every, args.profile_dir)
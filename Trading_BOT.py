@@ -5,6 +5,11 @@ import numpy as np
 import time
 import datetime
 import retrying
+from order_book import execution_price
+from trailing_stop import TrailingStopManager
+from order_tracker import OrderTracker
+from swing_points import SwingCache
+from market_data_bus import attach_reader
 
 print("Starting the script...")
 
@@ -42,6 +47,16 @@ risk_per_trade = 20  # $20 per trade
 risk_to_reward_ratio = 3  # 1:3 risk-to-reward ratio
 stop_loss_pct = 1 / leverage  # 1% price move as stop loss
 take_profit_pct = 3 / leverage  # 3% price move as take profit
+entry_order_ttl = 15 * 60  # Cancel entries still resting after one candle
+
+# Trailing stops ratchet in memory and only amend the exchange order after a 0.2% move
+trailing_stops = TrailingStopManager(exchange, trail_pct=stop_loss_pct, amend_threshold_pct=0.002)
+
+# Swing legs for Fibonacci levels, recomputed only when a new candle closes
+swing_cache = SwingCache(left=5, right=5, levels=fibonacci_levels)
+
+# Optional shared-memory feed from a local market_data_bus.py feeder (set TBOT_MARKET_BUS to its name)
+market_bus = attach_reader(os.getenv('TBOT_MARKET_BUS'))
 
 # Cached balance to avoid frequent API calls
 cached_balance = None
@@ -50,6 +65,10 @@ balance_cache_duration = 300  # Cache balance for 300 seconds (5 minutes)
 
 # Function to fetch OHLCV data
 def fetch_data(symbol, timeframe):
+    if market_bus is not None:
+        df = market_bus.frame(symbol, timeframe, rows=100)
+        if df is not None:
+            return df
     try:
         bars = exchange.fetch_ohlcv(symbol, timeframe, limit=100)
         df = pd.DataFrame(bars, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
@@ -59,6 +78,21 @@ def fetch_data(symbol, timeframe):
         print(f"Error fetching data: {e}")
         return None
 
+# Function to fetch a ticker, from the shared bus when it carries the symbol
+def fetch_ticker(symbol):
+    ticker = market_bus.ticker(symbol) if market_bus is not None else None
+    if ticker is None or any(ticker[field] != ticker[field] for field in ('high', 'low', 'last')):
+        ticker = exchange.fetch_ticker(symbol)
+    return ticker
+
+# Function to map symbols to last prices for the trailing stops; symbols missing on the bus are fetched
+def latest_prices(symbols):
+    prices = market_bus.prices(symbols) if market_bus is not None else {}
+    missing = [symbol for symbol in symbols if symbol not in prices]
+    if missing:
+        prices.update(trailing_stops.fetch_prices(missing))
+    return prices
+
 # Function to identify significant range breaks by analyzing historical price data
 def identify_range_breaks(data):
     data['high_max'] = data['high'].rolling(window=20).max()
@@ -80,13 +114,18 @@ def calculate_rsi(data, period):
     rsi = 100 - (100 / (1 + rs))
     return rsi
 
-# Function to calculate Fibonacci retracement levels and identify corrective waves
+# Function to calculate Fibonacci retracement levels of the latest swing leg and identify corrective waves
 def calculate_fibonacci(data):
-    max_price = data['high'].max()
-    min_price = data['low'].min()
-    fibonacci_levels_dict = {}
-    for level in fibonacci_levels:
-        fibonacci_levels_dict[level] = min_price + (max_price - min_price) * level
+    closed = data.iloc[:-1]  # The last candle is still forming and cannot confirm a swing
+    leg = swing_cache.latest_leg(symbol, closed['timestamp'].iloc[-1], closed['high'].to_numpy(), closed['low'].to_numpy())
+    if leg is not None:
+        max_price, min_price = leg['high'], leg['low']
+        fibonacci_levels_dict = leg['levels']
+    else:
+        # Not enough swings yet; fall back to the range of the fetched window
+        max_price = data['high'].max()
+        min_price = data['low'].min()
+        fibonacci_levels_dict = {level: min_price + (max_price - min_price) * level for level in fibonacci_levels}
     
     # Identify corrective wave based on Fibonacci levels
     last_close = data['close'].iloc[-1]
@@ -109,6 +148,8 @@ def calculate_position_size():
         except Exception as e:
             print(f"Error fetching balance: {e}")
             return 0
+    if not cached_balance:
+        return 0  # Avoid dividing by an empty balance
     return risk_per_trade / cached_balance  # Calculate position size based on risk per trade
 
 # Function to place an order with risk management (stop loss and take profit)
@@ -117,20 +158,46 @@ def place_order(order_type, amount, entry_price):
         if order_type == 'buy':
             stop_loss_price = entry_price * (1 - stop_loss_pct)
             take_profit_price = entry_price * (1 + take_profit_pct)
-            order = exchange.create_limit_buy_order(symbol, amount, entry_price * 1.01, {'leverage': leverage})  # Limit order to mitigate slippage
-            # Place stop loss and take profit orders
-            exchange.create_order(symbol, 'limit', 'sell', amount, take_profit_price, {'stopPrice': stop_loss_price})
+            order_price = execution_price(exchange, symbol, 'buy', amount, entry_price * 1.01)  # Price from the live book to mitigate slippage
+            order = exchange.create_limit_buy_order(symbol, amount, order_price, {'leverage': leverage})
         elif order_type == 'sell':
             stop_loss_price = entry_price * (1 + stop_loss_pct)
             take_profit_price = entry_price * (1 - take_profit_pct)
-            order = exchange.create_limit_sell_order(symbol, amount, entry_price * 0.99, {'leverage': leverage})  # Limit order to mitigate slippage
-            # Place stop loss and take profit orders
-            exchange.create_order(symbol, 'limit', 'buy', amount, take_profit_price, {'stopPrice': stop_loss_price})
+            order_price = execution_price(exchange, symbol, 'sell', amount, entry_price * 0.99)  # Price from the live book to mitigate slippage
+            order = exchange.create_limit_sell_order(symbol, amount, order_price, {'leverage': leverage})
         print(f"Order placed: {order}")
-        print(f"Stop Loss set at: {stop_loss_price}, Take Profit set at: {take_profit_price}")
+        print(f"Stop Loss will be set at: {stop_loss_price}, Take Profit at: {take_profit_price} once the entry fills")
+        # Stop loss, take profit and the trailing stop are placed when the entry actually fills (see on_order_event)
+        order_tracker.track(order['id'], symbol, order_type, amount, entry_price=order_price, stop_loss_price=stop_loss_price,
+                            take_profit_price=take_profit_price)
     except Exception as e:
         print(f"Error placing order: {e}")
 
+# Function to protect an entry once it fills: place the stop loss/take profit order for the filled amount and trail it
+def on_order_event(event, tracked, order):
+    filled = order.get('filled') or 0.0
+    if event == 'partial':
+        return
+    if event != 'filled' and not filled:
+        print(f"Entry on {tracked['symbol']} {event} without a fill.")
+        return
+    filled = filled or tracked['amount']
+    fill_price = order.get('average') or order.get('price') or tracked['entry_price']
+    exit_side = 'sell' if tracked['side'] == 'buy' else 'buy'
+    try:
+        protect = exchange.create_order(tracked['symbol'], 'limit', exit_side, filled, tracked['take_profit_price'],
+                                        {'stopPrice': tracked['stop_loss_price']})
+        protect_id = protect['id']
+        print(f"Entry on {tracked['symbol']} filled {filled} at {fill_price}. Stop Loss set at: {tracked['stop_loss_price']}, Take Profit set at: {tracked['take_profit_price']}")
+    except Exception as e:
+        # Armed without an order id, the trailing stop places the stop on its next price update
+        print(f"Error placing protective order for {tracked['symbol']}, retrying on the next price update: {e}")
+        protect_id = None
+    trailing_stops.add_position(tracked['symbol'], tracked['side'], filled, fill_price,
+                                tracked['stop_loss_price'], tracked['take_profit_price'], protect_id)
+
+order_tracker = OrderTracker(exchange, on_order_event, default_ttl=entry_order_ttl)
+
 # Function to check moving average cross and confirm new trend push
 def moving_average_cross(data, short_window=50, long_window=200):
     data['ma_short'] = data['close'].rolling(window=short_window).mean()
@@ -148,26 +215,31 @@ def moving_average_cross(data, short_window=50, long_window=200):
 
 # Function to check for impulse waves following corrective waves
 def identify_impulse_wave(data, fibonacci_levels_dict):
-    max_price = data['high'].max()
-    min_price = data['low'].min()
     last_close = data['close'].iloc[-1]
+    levels = np.array(list(fibonacci_levels_dict.keys()))
+    values = np.array(list(fibonacci_levels_dict.values()))
     # An impulse wave is identified if price moves significantly beyond key Fibonacci levels after a corrective wave
-    for level, value in fibonacci_levels_dict.items():
-        if last_close > value and level >= 0.618:  # Check for strong continuation beyond significant Fibonacci levels
-            print(f"Impulse wave identified following corrective wave at level {level}: {value}")
-            return 'impulse_up'
-        elif last_close < value and level <= 0.382:  # Check for strong decline beyond significant Fibonacci levels
-            print(f"Impulse wave identified following corrective wave at level {level}: {value}")
-            return 'impulse_down'
+    down = (last_close < values) & (levels <= 0.382)  # Strong decline beyond significant Fibonacci levels
+    up = (last_close > values) & (levels >= 0.618)  # Strong continuation beyond significant Fibonacci levels
+    if down.any():
+        print(f"Impulse wave identified following corrective wave at level {levels[down][0]}: {values[down][0]}")
+        return 'impulse_down'
+    elif up.any():
+        print(f"Impulse wave identified following corrective wave at level {levels[up][0]}: {values[up][0]}")
+        return 'impulse_up'
     return None
 
 # Main trading logic
 def trading_bot():
     last_run_time = None
+    trailing_stops.start(latest_prices)  # Background thread trailing stops for all open positions
     while True:
         current_time = datetime.datetime.utcnow()
         if last_run_time is None or (current_time - last_run_time).seconds >= 60:
-            market_volatility = abs(exchange.fetch_ticker(symbol)['high'] - exchange.fetch_ticker(symbol)['low']) / exchange.fetch_ticker(symbol)['low']
+            order_tracker.poll()
+            ticker = fetch_ticker(symbol)
+            market_volatility = abs(ticker['high'] - ticker['low']) / ticker['low']
+            trailing_stops.on_price(symbol, ticker['last'])
             interval = max(10, int(60 * market_volatility))  # Adjust interval based on market volatility, with a minimum of 10 seconds
             last_run_time = current_time
             time.sleep(interval)
@@ -209,8 +281,5 @@ def trading_bot():
                 print("Bearish breakout or crossover detected with RSI overbought condition and confirmed impulse wave. Placing Sell order.")
                 place_order('sell', amount, current_price)
 
-            # Implement trailing stop loss for better gains (optional)
-            # Placeholder for trailing stop logic - to be implemented as needed
-
 if __name__ == "_main_":
     trading_bot()
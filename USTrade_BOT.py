@@ -7,6 +7,7 @@ import datetime
 import retrying
 import logging
 import streamlit as st
+from market_data_bus import attach_reader
 
 # Streamlit layout configuration
 st.set_page_config(page_title="TradeBot Dashboard", layout="wide")
@@ -44,8 +45,15 @@ fibonacci_levels = [0.236, 0.382, 0.5, 0.618, 0.786]
 rsi_overbought = 70
 rsi_oversold = 30
 
+# Optional shared-memory feed from a local market_data_bus.py feeder (set TBOT_MARKET_BUS to its name)
+market_bus = attach_reader(os.getenv('TBOT_MARKET_BUS'))
+
 # Function to fetch OHLCV data
 def fetch_data(symbol, timeframe):
+    if market_bus is not None:
+        df = market_bus.frame(symbol, timeframe, rows=100)
+        if df is not None:
+            return df
     try:
         bars = exchange.fetch_ohlcv(symbol, timeframe, limit=100)
         df = pd.DataFrame(bars, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
@@ -113,6 +113,8 @@ def calculate_position_size():
         except Exception as e:
             logging.error(f"Error fetching balance: {e}")
             return 0
+    if not cached_balance:
+        return 0  # Avoid dividing by an empty balance
     return risk_per_trade / cached_balance
 
 # Function to place an order with risk management
@@ -0,0 +1,199 @@
+import copy
+import time
+import queue
+import sqlite3
+import logging
+import argparse
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import ccxt
+from exchange_adapter import ExchangeAdapter
+from multi_timeframe import timeframe_to_ms
+
+# Historical OHLCV downloader. The requested time range for every symbol/timeframe is split
+# into fixed pages up front (limit candles each), so all pages can be fetched concurrently
+# within the venue's rate budget. Re-running resumes after the last stored candle, and gaps
+# left by failed pages (including at the start of the requested range) are detected in SQL and
+# fetched again. Each pool thread fetches through its own ccxt instance.
+
+default_symbols = [
+    'BTC/USDT', 'ETH/USDT', 'SOL/USDT', 'BNB/USDT', 'LINK/USDT',
+    'XRP/USDT', 'DOGE/USDT', 'AVAX/USDT', 'DOT/USDT', 'ADA/USDT',
+    'TON/USDT', 'RAY/USDT'
+]
+
+# Function to open (and create if needed) the candle store
+def open_store(path):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS ohlcv ('
+        'symbol TEXT NOT NULL, timeframe TEXT NOT NULL, ts INTEGER NOT NULL, '
+        'open REAL, high REAL, low REAL, close REAL, volume REAL, '
+        'PRIMARY KEY (symbol, timeframe, ts)) WITHOUT ROWID'
+    )
+    conn.commit()
+    return conn
+
+def last_timestamp(conn, symbol, timeframe):
+    row = conn.execute('SELECT MAX(ts) FROM ohlcv WHERE symbol = ? AND timeframe = ?', (symbol, timeframe)).fetchone()
+    return row[0]
+
+# Function to list missing ranges as (first_missing_ts, next_present_ts) pairs. With a start
+# (and end), the span from start to the first stored candle is reported too, since LAG only
+# sees gaps between stored candles.
+def find_gaps(conn, symbol, timeframe, start=None, end=None):
+    tf_ms = timeframe_to_ms(timeframe)
+    gaps = []
+    if start is not None:
+        first = conn.execute('SELECT MIN(ts) FROM ohlcv WHERE symbol = ? AND timeframe = ?', (symbol, timeframe)).fetchone()[0]
+        if first is None:
+            if end is not None and start < end:
+                gaps.append((start, end))
+        elif first > start:
+            gaps.append((start, first))
+    rows = conn.execute(
+        'SELECT prev_ts, ts FROM ('
+        '  SELECT ts, LAG(ts) OVER (ORDER BY ts) AS prev_ts FROM ohlcv WHERE symbol = ? AND timeframe = ?'
+        ') WHERE ts - prev_ts > ?', (symbol, timeframe, tf_ms)
+    ).fetchall()
+    return gaps + [(prev_ts + tf_ms, ts) for prev_ts, ts in rows]
+
+# Function to read stored candles back in fetch_ohlcv format
+def load_candles(conn, symbol, timeframe, since=None, until=None):
+    return conn.execute(
+        'SELECT ts, open, high, low, close, volume FROM ohlcv '
+        'WHERE symbol = ? AND timeframe = ? AND ts >= ? AND ts < ? ORDER BY ts',
+        (symbol, timeframe, since or 0, until or 2 ** 62)
+    ).fetchall()
+
+# Function to split [start, end) into pages of `limit` candles
+def plan_pages(symbol, timeframe, start, end, limit):
+    page_ms = timeframe_to_ms(timeframe) * limit
+    return [(symbol, timeframe, page_start, min(page_start + page_ms, end)) for page_start in range(start, end, page_ms)]
+
+# Function to give the calling pool thread its own adapter; ccxt instances are not thread-safe.
+# The clone shares the adapter's HTTP session, rate budget and loaded markets.
+def thread_adapter(adapter, local):
+    if not isinstance(adapter.exchange, ccxt.Exchange):
+        return adapter
+    clone = getattr(local, 'adapter', None)
+    if clone is None:
+        template = adapter.exchange
+        exchange = type(template)({'apiKey': template.apiKey, 'secret': template.secret, 'password': template.password,
+                                   'enableRateLimit': False, 'session': template.session})
+        exchange.urls = copy.deepcopy(template.urls)
+        exchange.set_markets(template.markets, template.currencies)
+        clone = copy.copy(adapter)
+        clone.exchange = exchange
+        local.adapter = clone
+    return clone
+
+def fetch_page(adapter, page, limit, results, retries=3, stop=None):
+    symbol, timeframe, start, end = page
+    for attempt in range(1, retries + 1):
+        if stop is not None and stop.is_set():
+            break
+        try:
+            bars = adapter.fetch_ohlcv(symbol, timeframe, since=start, limit=limit)
+            results.put((page, [bar for bar in bars if start <= bar[0] < end]))
+            return True
+        except Exception as e:
+            logging.warning(f"{symbol} {timeframe} page at {start} failed (attempt {attempt}/{retries}): {e}")
+            time.sleep(attempt)
+    results.put((page, None))
+    return False
+
+# Function to fetch pages concurrently while a single thread writes them to SQLite.
+# A failed write stops the remaining fetches and is re-raised once the pool has drained.
+def run_pages(adapter, conn, pages, limit, workers):
+    results = queue.Queue()
+    local = threading.local()
+    stop = threading.Event()
+    stored, failed, write_error = 0, 0, None
+
+    def writer():
+        nonlocal stored, failed, write_error
+        for _ in range(len(pages)):
+            (symbol, timeframe, _start, _end), bars = results.get()
+            if bars is None or write_error is not None:
+                failed += 1
+                continue
+            try:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO ohlcv (symbol, timeframe, ts, open, high, low, close, volume) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    [(symbol, timeframe, int(bar[0]), bar[1], bar[2], bar[3], bar[4], bar[5]) for bar in bars]
+                )
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                logging.error(f"Writing {symbol} {timeframe} candles failed, stopping the backfill: {e}")
+                write_error = e
+                stop.set()
+                failed += 1
+                continue
+            stored += len(bars)
+
+    def fetch(page):
+        return fetch_page(thread_adapter(adapter, local), page, limit, results, stop=stop)
+
+    writer_thread = threading.Thread(target=writer, name='backfill-writer')
+    writer_thread.start()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for page in pages:
+            pool.submit(fetch, page)
+    writer_thread.join()
+    if write_error is not None:
+        raise write_error
+    return stored, failed
+
+def backfill(adapter, conn, symbols, timeframes, since_ms, limit=1000, workers=8):
+    adapter.exchange.load_markets()  # Load once; every thread's clone reuses these markets
+    now_ms = int(time.time() * 1000)
+    pages, ranges = [], {}
+    for symbol in symbols:
+        for timeframe in timeframes:
+            tf_ms = timeframe_to_ms(timeframe)
+            # Stop before the still-forming candle so only final candles are stored
+            end = now_ms - now_ms % tf_ms
+            first_wanted = since_ms - since_ms % tf_ms
+            ranges[(symbol, timeframe)] = (first_wanted, end)
+            last = last_timestamp(conn, symbol, timeframe)
+            start = last + tf_ms if last is not None else first_wanted
+            pages += plan_pages(symbol, timeframe, start, end, limit)
+    started = time.time()
+    logging.info(f"Backfilling {len(pages)} pages for {len(symbols)} symbols x {len(timeframes)} timeframes...")
+    stored, failed = run_pages(adapter, conn, pages, limit, workers)
+    logging.info(f"Stored {stored} candles in {time.time() - started:.1f}s ({failed} pages failed)")
+
+    gap_pages = []
+    for (symbol, timeframe), (first_wanted, end) in ranges.items():
+        for gap_start, gap_end in find_gaps(conn, symbol, timeframe, first_wanted, end):
+            gap_pages += plan_pages(symbol, timeframe, gap_start, gap_end, limit)
+    if gap_pages:
+        logging.info(f"Refilling {len(gap_pages)} pages of gaps...")
+        run_pages(adapter, conn, gap_pages, limit, workers)
+        for (symbol, timeframe), (first_wanted, end) in ranges.items():
+            for gap_start, gap_end in find_gaps(conn, symbol, timeframe, first_wanted, end):
+                # Usually an exchange outage or a listing gap, not a download failure
+                logging.warning(f"{symbol} {timeframe} still has no candles from {gap_start} to {gap_end}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Download OHLCV history into a local SQLite store.")
+    parser.add_argument('--symbols', nargs='+', default=default_symbols)
+    parser.add_argument('--timeframes', nargs='+', default=['15m'])
+    parser.add_argument('--since', default=None, help="UTC start date (YYYY-MM-DD) when nothing is stored yet; default 30 days ago")
+    parser.add_argument('--db', default='ohlcv_history.db')
+    parser.add_argument('--venue', default='mexc')
+    parser.add_argument('--limit', type=int, default=1000, help="Candles per request (venue maximum)")
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+    if args.since:
+        since = datetime.datetime.strptime(args.since, '%Y-%m-%d').replace(tzinfo=datetime.timezone.utc)
+    else:
+        since = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=30)
+    backfill(ExchangeAdapter(args.venue), open_store(args.db), args.symbols, args.timeframes,
+             int(since.timestamp() * 1000), args.limit, args.workers)
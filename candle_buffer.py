@@ -0,0 +1,150 @@
+import time
+import logging
+import numpy as np
+import pandas as pd
+
+from multi_timeframe import timeframe_to_ms
+from data_quality import clean_ohlcv, log_report, FILLED, ZERO_VOLUME, FORMING, REPAIRED
+
+# Fixed-capacity OHLCV ring buffer backed by contiguous NumPy arrays (int64 timestamps,
+# float64 prices/volume). Every row is written twice, at slot and slot + capacity, so the
+# latest rows are always one contiguous slice and view() never copies. Memory per symbol is
+# 49 bytes * 2 * capacity, allocated once. A uint8 flags column holds the data_quality bits.
+
+fields = ('open', 'high', 'low', 'close', 'volume')
+
+class CandleRingBuffer:
+    def __init__(self, capacity=200):
+        self.capacity = capacity
+        self.timestamps = np.zeros(2 * capacity, dtype=np.int64)
+        self.values = {field: np.zeros(2 * capacity, dtype=np.float64) for field in fields}
+        self.flags = np.zeros(2 * capacity, dtype=np.uint8)
+        self.written = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def last_timestamp(self):
+        return int(self.timestamps[(self.written - 1) % self.capacity]) if self.count else None
+
+    def _write(self, slot, bar, flags=0):
+        for offset in (slot, slot + self.capacity):
+            self.flags[offset] = flags
+            self.timestamps[offset] = bar[0]
+            self.values['open'][offset] = bar[1]
+            self.values['high'][offset] = bar[2]
+            self.values['low'][offset] = bar[3]
+            self.values['close'][offset] = bar[4]
+            self.values['volume'][offset] = bar[5]
+
+    # Function to add candles as returned by fetch_ohlcv; a repeated last timestamp updates the forming candle
+    def extend(self, bars):
+        last = self.last_timestamp()
+        for bar in bars:
+            ts = int(bar[0])
+            if last is not None and ts < last:
+                continue
+            if last is not None and ts == last:
+                self._write((self.written - 1) % self.capacity, bar)
+                continue
+            self._write(self.written % self.capacity, bar)
+            self.written += 1
+            self.count = min(self.count + 1, self.capacity)
+            last = ts
+
+    # Function to add candles from a 2-D array whose first six columns are timestamp, open, high,
+    # low, close, volume; same rules as extend(), but written with vectorized slot assignment
+    def extend_array(self, rows, flags=None):
+        if not len(rows):
+            return
+        timestamps = rows[:, 0].astype(np.int64)
+        if flags is None:
+            flags = np.zeros(len(timestamps), dtype=np.uint8)
+        last = self.last_timestamp()
+        if last is not None:
+            keep = timestamps >= last
+            rows, timestamps, flags = rows[keep], timestamps[keep], flags[keep]
+            if len(timestamps) and timestamps[0] == last:
+                self._write((self.written - 1) % self.capacity, rows[0], flags[0])
+                rows, timestamps, flags = rows[1:], timestamps[1:], flags[1:]
+        rows, timestamps, flags = rows[-self.capacity:], timestamps[-self.capacity:], flags[-self.capacity:]
+        if not len(timestamps):
+            return
+        slots = (self.written + np.arange(len(timestamps))) % self.capacity
+        for offset in (slots, slots + self.capacity):
+            self.timestamps[offset] = timestamps
+            self.flags[offset] = flags
+            for column, field in enumerate(fields, start=1):
+                self.values[field][offset] = rows[:, column]
+        self.written += len(timestamps)
+        self.count = min(self.count + len(timestamps), self.capacity)
+
+    def clear(self):
+        self.written = 0
+        self.count = 0
+
+    def _bounds(self):
+        end = (self.written - 1) % self.capacity + self.capacity + 1
+        return end - self.count, end
+
+    # Function to return a zero-copy view of one column, oldest first; valid until the next extend()
+    def view(self, field):
+        start, end = self._bounds()
+        if field == 'timestamp':
+            return self.timestamps[start:end]
+        if field == 'flags':
+            return self.flags[start:end]
+        return self.values[field][start:end]
+
+    # Function to build a DataFrame shaped like fetch_data() output (for display only)
+    def to_frame(self):
+        df = pd.DataFrame({'timestamp': self.view('timestamp'), **{field: self.view(field) for field in fields}})
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+        return df
+
+# Read-only view of a buffer (or shared bus view) without its trailing still-forming candles,
+# so indicators and crossovers at [-1]/[-2] only ever see final bars
+class ClosedCandles:
+    def __init__(self, data):
+        self.data = data
+        flags = data.view('flags')
+        self.count = len(flags) - int(np.count_nonzero(flags & FORMING))
+
+    def __len__(self):
+        return self.count
+
+    def view(self, field):
+        return self.data.view(field)[:self.count]
+
+    # Function to return the data_quality bits that make the newest closed bar unfit to signal on
+    # (synthetic, zero-volume or repaired); 0 when the bar is a normal traded candle
+    def signal_bar_issues(self):
+        if not self.count:
+            return 0
+        return int(self.view('flags')[-1]) & (FILLED | ZERO_VOLUME | REPAIRED)
+
+# Function to return the timestamp to fetch from (None for a full load), clearing a stale buffer
+def resume_from(buffer, symbol, timeframe):
+    last = buffer.last_timestamp()
+    now_ms = int(time.time() * 1000)
+    if last is not None and now_ms - last > buffer.capacity * timeframe_to_ms(timeframe):
+        logging.info(f"{symbol} buffer is older than its capacity. Reloading.")
+        buffer.clear()
+        last = None
+    return last
+
+# Function to validate fetched rows (see data_quality.py) and append them to a buffer
+def store_rows(buffer, rows, symbol, timeframe):
+    last = buffer.last_timestamp()
+    last_close = float(buffer.view('close')[-1]) if last is not None else None
+    rows, flags, report = clean_ohlcv(rows, timeframe_to_ms(timeframe), int(time.time() * 1000), last, last_close)
+    log_report(symbol, report)
+    buffer.extend_array(rows, flags)
+    return buffer
+
+# Function to top up a buffer with only the candles it is missing (full reload when cold or stale)
+def fetch_into(buffer, exchange, symbol, timeframe):
+    last = resume_from(buffer, symbol, timeframe)
+    bars = exchange.fetch_ohlcv(symbol, timeframe, since=last, limit=buffer.capacity)
+    return store_rows(buffer, bars, symbol, timeframe)
@@ -0,0 +1,125 @@
+import logging
+import numpy as np
+
+# Rolling correlation of log returns across the whole watchlist, updated incrementally once per
+# candle: the running sums and cross-products are adjusted for the row entering and the row
+# leaving the window (O(N^2) vectorized per update) instead of recomputing from scratch.
+# Symbols are grouped into clusters (connected components of correlation >= threshold), and a
+# signal is suppressed or down-weighted once its cluster already holds max_per_cluster open
+# positions in the same direction, so a chain of correlated symbols cannot stack the same bet
+# even when each pair sits below the threshold. Direct pairwise overlap (including a short on
+# a symbol that moves against an open long) is still checked.
+
+class RollingCorrelation:
+    def __init__(self, symbols, window=96, recompute_every=None):
+        self.symbols = list(symbols)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.window = window
+        n = len(self.symbols)
+        self.returns = np.zeros((window, n))
+        self.sums = np.zeros(n)
+        self.cross = np.zeros((n, n))
+        self.count = 0
+        self.position = 0
+        self.updates = 0
+        # Running sums drift slowly in floating point; rebuild them from the window periodically
+        self.recompute_every = recompute_every or window * 10
+        self.last_closes = None
+
+    # Function to add one row of returns (NaN for symbols without a new candle counts as no move)
+    def update(self, returns):
+        row = np.nan_to_num(np.asarray(returns, dtype=np.float64), nan=0.0, posinf=0.0, neginf=0.0)
+        if self.count == self.window:
+            old = self.returns[self.position]
+            self.sums -= old
+            self.cross -= np.outer(old, old)
+        else:
+            self.count += 1
+        self.returns[self.position] = row
+        self.sums += row
+        self.cross += np.outer(row, row)
+        self.position = (self.position + 1) % self.window
+        self.updates += 1
+        if self.updates % self.recompute_every == 0:
+            filled = self.returns[:self.count]
+            self.sums = filled.sum(axis=0)
+            self.cross = filled.T @ filled
+
+    # Function to add one row of closes in self.symbols order; returns are taken against the previous row
+    def update_closes(self, closes):
+        closes = np.asarray(closes, dtype=np.float64)
+        if self.last_closes is not None:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                self.update(np.log(closes / self.last_closes))
+        self.last_closes = np.where(np.isnan(closes), self.last_closes if self.last_closes is not None else closes, closes)
+
+    # Function to return the current correlation matrix (zero where a symbol has no variance)
+    def matrix(self):
+        n = max(self.count, 1)
+        mean = self.sums / n
+        covariance = self.cross / n - np.outer(mean, mean)
+        std = np.sqrt(np.clip(np.diag(covariance), 0.0, None))
+        scale = np.outer(std, std)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            correlation = np.where(scale > 0, covariance / scale, 0.0)
+        np.fill_diagonal(correlation, 1.0)
+        return np.clip(correlation, -1.0, 1.0)
+
+    # Function to group symbols whose pairwise correlation is at least threshold (connected components)
+    def clusters(self, threshold=0.8):
+        correlation = self.matrix()
+        parent = list(range(len(self.symbols)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for i, j in np.argwhere(np.triu(correlation >= threshold, k=1)):
+            parent[find(i)] = find(j)
+        groups = {}
+        for i, symbol in enumerate(self.symbols):
+            groups.setdefault(find(i), []).append(symbol)
+        return list(groups.values())
+
+class CorrelationFilter:
+    def __init__(self, tracker, threshold=0.8, min_samples=30, suppress=True, max_per_cluster=1):
+        self.tracker = tracker
+        self.threshold = threshold
+        self.min_samples = min_samples
+        self.suppress = suppress
+        self.max_per_cluster = max_per_cluster
+        self.cluster_of = {}
+        self.clusters_at = None
+
+    # Function to map each symbol to its cluster, recomputed only after the correlations change
+    def cluster_index(self):
+        if self.clusters_at != self.tracker.updates:
+            self.cluster_of = {symbol: i for i, members in enumerate(self.tracker.clusters(self.threshold)) for symbol in members}
+            self.clusters_at = self.tracker.updates
+        return self.cluster_of
+
+    # Function to weight a new signal against open positions ({symbol: 'buy'|'sell'}):
+    # 1.0 keeps the full size, 0.0 suppresses it
+    def weight(self, symbol, side, open_positions):
+        if self.tracker.count < self.min_samples or symbol not in self.tracker.index or not open_positions:
+            return 1.0
+        cluster_of = self.cluster_index()
+        stacked = [other for other, other_side in open_positions.items()
+                   if other != symbol and other_side == side and other in cluster_of and cluster_of[other] == cluster_of[symbol]]
+        if len(stacked) >= self.max_per_cluster:
+            logging.info(f"{side} signal on {symbol} would stack cluster with open {stacked}.")
+            return 0.0 if self.suppress else 1.0 / (1 + len(stacked))
+        correlation = self.tracker.matrix()[self.tracker.index[symbol]]
+        overlap = 0.0
+        for other, other_side in open_positions.items():
+            if other == symbol or other not in self.tracker.index:
+                continue
+            # A long on a symbol is the same bet as a short on one that moves against it
+            same_bet = correlation[self.tracker.index[other]] * (1 if other_side == side else -1)
+            overlap = max(overlap, same_bet)
+        if overlap >= self.threshold:
+            logging.info(f"{side} signal on {symbol} overlaps an open position (correlation {overlap:.2f}).")
+            return 0.0 if self.suppress else max(0.0, 1.0 - overlap)
+        return max(0.0, 1.0 - max(overlap, 0.0)) if not self.suppress else 1.0
@@ -0,0 +1,124 @@
+import logging
+import numpy as np
+
+# Validation stage between fetching OHLCV rows and computing indicators. Every check is a
+# vectorized NumPy pass over the batch: out-of-order rows are sorted (only when unsorted),
+# duplicate timestamps keep the last copy (the freshest update of a forming candle), rows with
+# misaligned timestamps or non-positive prices are dropped, high/low are widened to contain
+# open/close, and missing candles are filled with flat zero-volume bars at the previous close
+# so rolling windows always span the same amount of time. Each surviving row carries a bit
+# mask of what was done to it or noticed about it.
+
+FILLED = 1        # synthetic bar inserted for a missing candle
+ZERO_VOLUME = 2   # real bar with no traded volume
+FORMING = 4       # candle has not closed yet
+REPAIRED = 8      # high/low adjusted to contain open/close
+
+# Function to check in a few vectorized passes that a batch needs no repair: aligned, contiguous
+# with the stored candle, positive finite prices with high/low containing open/close, volume >= 0
+def _is_clean(rows, timestamps, timeframe_ms, last_timestamp):
+    if timestamps[0] % timeframe_ms or (last_timestamp is not None and timestamps[0] - last_timestamp not in (0, timeframe_ms)):
+        return False
+    if rows.shape[0] > 1 and not (np.diff(timestamps) == timeframe_ms).all():
+        return False
+    high, low = rows[:, 2], rows[:, 3]
+    body = rows[:, [1, 4]]
+    return bool(((low > 0) & (high < np.inf) & (high >= body.max(axis=1)) & (low <= body.min(axis=1)) & (rows[:, 5] >= 0)).all())
+
+# Function to validate and repair rows of [timestamp, open, high, low, close, volume, ...].
+# last_timestamp/last_close describe the newest candle already stored, so a gap between it and
+# this batch is filled too. Returns (rows with six columns, flags per row, report of counts).
+def clean_ohlcv(rows, timeframe_ms, now_ms=None, last_timestamp=None, last_close=None, fill_gaps=True, max_fill=1000):
+    report = {'out_of_order': 0, 'duplicates': 0, 'dropped': 0, 'repaired': 0, 'filled': 0, 'zero_volume': 0, 'forming': 0}
+    rows = np.asarray(rows, dtype=np.float64)
+    if rows.ndim != 2 or rows.shape[0] == 0:
+        return np.empty((0, 6)), np.empty(0, np.uint8), report
+    rows = rows[:, :6]
+    timestamps = rows[:, 0].astype(np.int64)
+    if last_timestamp is not None and timestamps[0] < last_timestamp:
+        # History the caller already stores is not a quality problem
+        newer = timestamps >= last_timestamp
+        rows, timestamps = rows[newer], timestamps[newer]
+        if rows.shape[0] == 0:
+            return np.empty((0, 6)), np.empty(0, np.uint8), report
+    if _is_clean(rows, timestamps, timeframe_ms, last_timestamp):
+        # Common case of a warm poll: contiguous, valid rows only need their flags
+        flags = np.zeros(rows.shape[0], dtype=np.uint8)
+        flags[rows[:, 5] <= 0] = ZERO_VOLUME
+        report['zero_volume'] = int(np.count_nonzero(flags))
+        if now_ms is not None and timestamps[-1] + timeframe_ms > now_ms:
+            forming = timestamps + timeframe_ms > now_ms
+            flags[forming] |= FORMING
+            report['forming'] = int(np.count_nonzero(forming))
+        return rows, flags, report
+
+    if np.any(timestamps[1:] < timestamps[:-1]):
+        report['out_of_order'] = int(np.count_nonzero(timestamps[1:] < timestamps[:-1]))
+        order = np.argsort(timestamps, kind='stable')
+        rows, timestamps = rows[order], timestamps[order]
+
+    keep = np.ones(rows.shape[0], dtype=np.bool_)
+    keep[:-1] = timestamps[1:] != timestamps[:-1]
+    report['duplicates'] = int(rows.shape[0] - np.count_nonzero(keep))
+    prices = rows[:, 1:5]
+    valid = np.isfinite(prices).all(axis=1) & (prices > 0).all(axis=1) & (timestamps % timeframe_ms == 0)
+    if last_timestamp is not None:
+        valid &= timestamps >= last_timestamp
+    report['dropped'] = int(np.count_nonzero(keep & ~valid))
+    keep &= valid
+    rows, timestamps = rows[keep], timestamps[keep]
+    if rows.shape[0] == 0:
+        return np.empty((0, 6)), np.empty(0, np.uint8), report
+
+    volume = rows[:, 5]
+    rows[:, 5] = np.where(np.isfinite(volume) & (volume > 0), volume, 0.0)
+    high = np.maximum(rows[:, 2], rows[:, [1, 3, 4]].max(axis=1))
+    low = np.minimum(rows[:, 3], rows[:, [1, 2, 4]].min(axis=1))
+    repaired = (high != rows[:, 2]) | (low != rows[:, 3])
+    rows[:, 2], rows[:, 3] = high, low
+    flags = np.where(repaired, REPAIRED, 0).astype(np.uint8)
+    report['repaired'] = int(np.count_nonzero(repaired))
+
+    if fill_gaps:
+        # Anchor on the stored candle so a gap before this batch is filled as well
+        anchored = last_timestamp is not None and last_close is not None and last_timestamp < timestamps[0]
+        if anchored:
+            rows = np.vstack(([last_timestamp, last_close, last_close, last_close, last_close, 0.0], rows))
+            flags = np.concatenate(([0], flags)).astype(np.uint8)
+            timestamps = np.concatenate(([last_timestamp], timestamps))
+        slots = (timestamps - timestamps[0]) // timeframe_ms
+        total = int(slots[-1]) + 1
+        if total > rows.shape[0] and total - rows.shape[0] <= max_fill:
+            full = np.empty((total, 6))
+            full_flags = np.full(total, FILLED, dtype=np.uint8)
+            full[slots] = rows
+            full_flags[slots] = flags
+            # Each synthetic bar copies the close of the nearest real bar before it
+            source = np.zeros(total, dtype=np.int64)
+            source[slots] = slots
+            source = np.maximum.accumulate(source)
+            synthetic = full_flags == FILLED
+            full[synthetic, 1:5] = full[source[synthetic], 4][:, None]
+            full[synthetic, 5] = 0.0
+            full[:, 0] = timestamps[0] + np.arange(total) * timeframe_ms
+            report['filled'] = int(np.count_nonzero(synthetic))
+            rows, flags = full, full_flags
+        elif total > rows.shape[0]:
+            logging.warning(f"Gap of {total - rows.shape[0]} candles is above max_fill={max_fill}; left unfilled.")
+        if anchored:
+            rows, flags = rows[1:], flags[1:]
+
+    zero_volume = (rows[:, 5] == 0) & ((flags & FILLED) == 0)
+    flags[zero_volume] |= ZERO_VOLUME
+    report['zero_volume'] = int(np.count_nonzero(zero_volume))
+    if now_ms is not None:
+        forming = rows[:, 0] + timeframe_ms > now_ms
+        flags[forming] |= FORMING
+        report['forming'] = int(np.count_nonzero(forming))
+    return rows, flags, report
+
+# Function to log a validation report; forming and zero-volume candles are only flagged
+def log_report(symbol, report):
+    problems = {name: count for name, count in report.items() if count and name not in ('forming', 'zero_volume')}
+    if problems:
+        logging.warning(f"Data quality issues in {symbol} candles: {problems}")
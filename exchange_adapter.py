@@ -0,0 +1,149 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import ccxt
+import requests
+from requests.adapters import HTTPAdapter
+
+# Exchange adapter layer: one adapter per venue exposing the calls the bots use, all sharing a
+# single requests.Session so keep-alive connections are pooled per host across venues, with a
+# venue-specific request budget enforced in-process. Calls without a dedicated method are
+# forwarded to the ccxt instance, so an adapter can stand in wherever a ccxt exchange is expected.
+
+# Default credentials and request budgets per venue (requests per second, burst size)
+venue_settings = {
+    'mexc': {'api_key_env': 'MEXC_API_KEY', 'secret_env': 'MEXC_SECRET_KEY', 'rate': 10, 'burst': 20},
+    'binance': {'api_key_env': 'BINANCE_API_KEY', 'secret_env': 'BINANCE_SECRET_KEY', 'rate': 15, 'burst': 40},
+    'bybit': {'api_key_env': 'BYBIT_API_KEY', 'secret_env': 'BYBIT_SECRET_KEY', 'rate': 10, 'burst': 20},
+    'okx': {'api_key_env': 'OKX_API_KEY', 'secret_env': 'OKX_SECRET_KEY', 'password_env': 'OKX_PASSPHRASE', 'rate': 10, 'burst': 20},
+}
+
+# Function to create an HTTP session whose connection pools are shared by every venue
+def create_shared_session(pool_connections=8, pool_maxsize=32):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+# Token bucket limiting how fast requests are sent to one venue
+class RateBudget:
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    # Function to block until `cost` tokens are available
+    def acquire(self, cost=1):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= cost:
+                    self.tokens -= cost
+                    return
+                wait = (cost - self.tokens) / self.rate
+            time.sleep(wait)
+
+class ExchangeAdapter:
+    def __init__(self, venue, session=None, rate=None, burst=None, config=None):
+        settings = venue_settings.get(venue, {})
+        params = {
+            'apiKey': os.getenv(settings.get('api_key_env', f'{venue.upper()}_API_KEY')),
+            'secret': os.getenv(settings.get('secret_env', f'{venue.upper()}_SECRET_KEY')),
+            # Throttling is done by the shared RateBudget below rather than per ccxt instance
+            'enableRateLimit': False,
+        }
+        if 'password_env' in settings:
+            params['password'] = os.getenv(settings['password_env'])
+        if session is not None:
+            params['session'] = session
+        params.update(config or {})
+        self.venue = venue
+        self.exchange = getattr(ccxt, venue)(params)
+        self.budget = RateBudget(rate or settings.get('rate', 5), burst or settings.get('burst', 10))
+
+    def _call(self, method, *args, cost=1):
+        self.budget.acquire(cost)
+        return getattr(self.exchange, method)(*args)
+
+    # Function to forward the rest of the ccxt surface (id, has, markets, load_markets, fetch_order,
+    # fetch_open_orders, ...) to the wrapped exchange; method calls still draw from the venue budget
+    def __getattr__(self, name):
+        if name == 'exchange':
+            raise AttributeError(name)
+        attribute = getattr(self.exchange, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            self.budget.acquire()
+            return attribute(*args, **kwargs)
+        return call
+
+    def fetch_ohlcv(self, symbol, timeframe='15m', since=None, limit=None):
+        return self._call('fetch_ohlcv', symbol, timeframe, since, limit)
+
+    def fetch_ticker(self, symbol):
+        return self._call('fetch_ticker', symbol)
+
+    def fetch_tickers(self, symbols=None):
+        return self._call('fetch_tickers', symbols, cost=5)
+
+    def fetch_order_book(self, symbol, limit=None):
+        return self._call('fetch_order_book', symbol, limit)
+
+    def fetch_balance(self):
+        return self._call('fetch_balance')
+
+    def create_order(self, symbol, order_type, side, amount, price=None, params=None):
+        return self._call('create_order', symbol, order_type, side, amount, price, params or {})
+
+    def cancel_order(self, order_id, symbol=None):
+        return self._call('cancel_order', order_id, symbol)
+
+# Several venues in one process sharing the HTTP session
+class ExchangePool:
+    def __init__(self, venues, session=None):
+        self.session = session or create_shared_session()
+        self.adapters = {}
+        for venue in venues:
+            try:
+                self.adapters[venue] = ExchangeAdapter(venue, session=self.session)
+                logging.info(f"Exchange adapter for {venue} initialized.")
+            except Exception as e:
+                logging.error(f"Error initializing {venue} adapter: {e}")
+
+    def get(self, venue):
+        return self.adapters[venue]
+
+    # Function to call the same method on every venue concurrently; failed venues are left out
+    def call_all(self, method, *args):
+        def call(venue):
+            try:
+                return venue, getattr(self.adapters[venue], method)(*args)
+            except Exception as e:
+                logging.warning(f"{method} on {venue} failed: {e}")
+                return venue, None
+
+        with ThreadPoolExecutor(max_workers=max(1, len(self.adapters))) as pool:
+            return {venue: result for venue, result in pool.map(call, list(self.adapters)) if result is not None}
+
+    # Function to find the venue with the best price for a side: lowest ask to buy, highest bid to sell
+    def best_venue(self, symbol, side):
+        tickers = self.call_all('fetch_ticker', symbol)
+        quotes = {venue: ticker['ask'] if side == 'buy' else ticker['bid'] for venue, ticker in tickers.items()}
+        quotes = {venue: price for venue, price in quotes.items() if price}
+        if not quotes:
+            return None, None
+        venue = min(quotes, key=quotes.get) if side == 'buy' else max(quotes, key=quotes.get)
+        return venue, quotes[venue]
+
+    def close(self):
+        self.session.close()
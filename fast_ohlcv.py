@@ -0,0 +1,128 @@
+import json
+import time
+import logging
+import argparse
+import numpy as np
+
+from candle_buffer import CandleRingBuffer, resume_from, store_rows
+from exchange_adapter import create_shared_session
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Fast OHLCV path for the MEXC spot kline endpoint. ccxt decodes the response into Python lists,
+# then builds a new list per candle with a float() per field; here the raw response bytes are
+# turned into one float64 array in a single C-level pass (brackets and quotes stripped, then
+# np.fromstring on the commas) and written into a CandleRingBuffer with vectorized slot
+# assignment. Requests go through the shared keep-alive session with gzip enabled and ask only
+# for candles from the buffer's last timestamp onwards, so a warm poll returns one or two rows.
+
+base_url = 'https://api.mexc.com'
+kline_path = '/api/v3/klines'
+kline_fields = 8  # open time, open, high, low, close, volume, close time, quote volume
+
+# ccxt timeframe -> MEXC spot interval
+mexc_intervals = {'1m': '1m', '5m': '5m', '15m': '15m', '30m': '30m', '1h': '60m', '4h': '4h', '1d': '1d', '1w': '1W', '1M': '1M'}
+
+# Function to convert a unified spot symbol ('BTC/USDT') to the MEXC market id ('BTCUSDT')
+def market_id(symbol):
+    return symbol.split(':')[0].replace('/', '')
+
+# Function to parse a kline response body into an (n, 8) float64 array without building Python rows
+def parse_klines(body):
+    flat = np.fromstring(body.translate(None, b'[]" \n'), dtype=np.float64, sep=',')
+    if flat.size % kline_fields:
+        raise ValueError(f"Unexpected kline payload ({flat.size} values)")
+    return flat.reshape(-1, kline_fields)
+
+# Function to parse a kline body with orjson (reference path for the benchmark)
+def parse_klines_orjson(body):
+    rows = orjson.loads(body)
+    return np.array(rows, dtype=np.float64).reshape(-1, kline_fields)
+
+class FastKlineClient:
+    def __init__(self, session=None, url=base_url, timeout=10):
+        self.session = session or create_shared_session()
+        self.session.headers.setdefault('Accept-Encoding', 'gzip, deflate')
+        self.url = url + kline_path
+        self.timeout = timeout
+
+    # Function to return the raw response body for one kline request
+    def fetch_raw(self, symbol, timeframe, since=None, limit=None):
+        params = {'symbol': market_id(symbol), 'interval': mexc_intervals[timeframe]}
+        if since is not None:
+            params['startTime'] = int(since)
+        if limit:
+            params['limit'] = int(limit)
+        response = self.session.get(self.url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.content
+
+    def fetch_ohlcv_array(self, symbol, timeframe, since=None, limit=None):
+        return parse_klines(self.fetch_raw(symbol, timeframe, since, limit))
+
+# Function to top up a buffer from the kline endpoint; same contract as candle_buffer.fetch_into()
+def fetch_into_fast(buffer, client, symbol, timeframe):
+    last = resume_from(buffer, symbol, timeframe)
+    return store_rows(buffer, client.fetch_ohlcv_array(symbol, timeframe, since=last, limit=buffer.capacity), symbol, timeframe)
+
+# Function to build a kline body shaped like MEXC's for offline benchmarking
+def sample_body(rows=200, start_ms=1700000000000, step_ms=900000):
+    rng = np.random.default_rng(0)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, rows)))
+    data = [[start_ms + i * step_ms, f"{close[i - 1] if i else close[0]:.4f}", f"{close[i] * 1.001:.4f}",
+             f"{close[i] * 0.999:.4f}", f"{close[i]:.4f}", f"{rng.uniform(1, 100):.2f}",
+             start_ms + (i + 1) * step_ms - 1, f"{rng.uniform(100, 10000):.2f}"] for i in range(rows)]
+    return json.dumps(data, separators=(',', ':')).encode()
+
+# Function to measure CPU time per call of fn(body)
+def cpu_per_call(fn, body, repeat):
+    started = time.process_time()
+    for _ in range(repeat):
+        fn(body)
+    return (time.process_time() - started) / repeat
+
+# Function to compare decode cost: ccxt (+ the old DataFrame build), orjson and the buffer parser
+def benchmark(body, repeat=2000):
+    import ccxt
+    import pandas as pd
+    exchange = ccxt.mexc()
+
+    def ccxt_frame(payload):
+        bars = exchange.parse_ohlcvs(json.loads(payload), None, '15m')
+        return pd.DataFrame(bars, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+
+    def ccxt_buffer(payload):
+        CandleRingBuffer(200).extend(exchange.parse_ohlcvs(json.loads(payload), None, '15m'))
+
+    def fast_buffer(payload):
+        CandleRingBuffer(200).extend_array(parse_klines(payload))
+
+    paths = [('ccxt + DataFrame', ccxt_frame), ('ccxt + ring buffer', ccxt_buffer)]
+    if orjson is not None:
+        paths.append(('orjson + ring buffer', lambda payload: CandleRingBuffer(200).extend_array(parse_klines_orjson(payload))))
+    paths.append(('raw parse + ring buffer', fast_buffer))
+    results = {name: cpu_per_call(fn, body, repeat) for name, fn in paths}
+    baseline = results['ccxt + DataFrame']
+    for name, seconds in results.items():
+        print(f"{name:<26} {seconds * 1e6:9.1f} us/call  ({baseline / seconds:5.1f}x)")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark OHLCV decoding paths for the MEXC kline endpoint.")
+    parser.add_argument('--rows', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=2000)
+    parser.add_argument('--live', metavar='SYMBOL', help="Benchmark a live response for SYMBOL instead of a synthetic one")
+    parser.add_argument('--timeframe', default='15m')
+    args = parser.parse_args()
+    if args.live:
+        client = FastKlineClient()
+        started = time.perf_counter()
+        body = client.fetch_raw(args.live, args.timeframe, limit=args.rows)
+        logging.info(f"Fetched {len(body)} bytes in {time.perf_counter() - started:.3f}s")
+    else:
+        body = sample_body(args.rows)
+    print(f"{len(parse_klines(body))} candles, {len(body)} bytes")
+    benchmark(body, args.repeat)
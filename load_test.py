@@ -0,0 +1,310 @@
+import os
+import json
+import time
+import math
+import zlib
+import random
+import logging
+import argparse
+import threading
+import resource
+import multiprocessing
+from collections import Counter
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Load test for TBOT_LENV.py against a local mock of the MEXC spot REST API. The mock runs in
+# its own process (so its CPU is not billed to the bot), serves deterministic synthetic candles
+# for any number of symbols and adds configurable latency, jitter and error rates. The driver
+# runs real bot cycles with growing watchlists and reports cycle time, API calls per cycle,
+# CPU, memory and time per stage, which shows the capacity curve and the first bottleneck.
+# Every cycle starts with no active trade so the whole watchlist is scanned each time.
+
+interval_ms = {'1m': 60000, '5m': 300000, '15m': 900000, '30m': 1800000, '60m': 3600000, '4h': 14400000, '1d': 86400000}
+
+# Function to name the synthetic universe: S0000/USDT, S0001/USDT, ...
+def mock_symbols(count):
+    return [f"S{i:04d}/USDT" for i in range(count)]
+
+# Deterministic synthetic market for the mock: prices are a sum of sines per symbol
+class MockMarket:
+    def __init__(self, count):
+        self.ids = {symbol.replace('/', ''): symbol for symbol in mock_symbols(count)}
+        self.orders = {}
+        self.next_order_id = 1
+        self.lock = threading.Lock()
+
+    def _shape(self, market_id):
+        seed = zlib.crc32(market_id.encode())
+        return 1 + seed % 50000 / 100, (seed % 1000) / 1000 * 2 * math.pi
+
+    def close(self, market_id, index):
+        base, phase = self._shape(market_id)
+        return base * (1 + 0.03 * math.sin(index / 37 + phase) + 0.01 * math.sin(index / 5.3 + 2 * phase)
+                       + 0.004 * math.sin(index * 1.7 + 3 * phase))
+
+    def last(self, market_id):
+        return self.close(market_id, int(time.time() * 1000) // 60000)
+
+    def klines(self, market_id, interval, start_time=None, limit=500):
+        step = interval_ms[interval]
+        now_index = int(time.time() * 1000) // step
+        first = start_time // step if start_time is not None else now_index - limit + 1
+        last = min(first + limit - 1, now_index)
+        rows = []
+        for index in range(first, last + 1):
+            open_price, close_price = self.close(market_id, index - 1), self.close(market_id, index)
+            volume = 10 + 5 * math.sin(index * 0.9)
+            rows.append([index * step, f"{open_price:.6f}", f"{max(open_price, close_price) * 1.002:.6f}",
+                         f"{min(open_price, close_price) * 0.998:.6f}", f"{close_price:.6f}", f"{volume:.4f}",
+                         (index + 1) * step - 1, f"{volume * close_price:.4f}"])
+        return rows
+
+    def ticker(self, market_id):
+        last = self.last(market_id)
+        return {'symbol': market_id, 'lastPrice': str(last), 'bidPrice': str(last * 0.9995), 'askPrice': str(last * 1.0005),
+                'bidQty': '100', 'askQty': '100', 'openPrice': str(last), 'highPrice': str(last * 1.02),
+                'lowPrice': str(last * 0.98), 'volume': '1000', 'quoteVolume': str(1000 * last), 'closeTime': int(time.time() * 1000)}
+
+    def depth(self, market_id, limit=20):
+        last = self.last(market_id)
+        levels = min(limit, 20)
+        return {'lastUpdateId': int(time.time() * 1000),
+                'bids': [[f"{last * (1 - 0.0005 * (i + 1)):.6f}", '50'] for i in range(levels)],
+                'asks': [[f"{last * (1 + 0.0005 * (i + 1)):.6f}", '50'] for i in range(levels)]}
+
+    def exchange_info(self):
+        return {'timezone': 'CST', 'serverTime': int(time.time() * 1000), 'symbols': [
+            {'symbol': market_id, 'status': '1', 'baseAsset': market_id[:-4], 'quoteAsset': 'USDT',
+             'baseAssetPrecision': 4, 'quoteAssetPrecision': 6, 'baseSizePrecision': '0.0001', 'quoteAmountPrecision': '1',
+             'isSpotTradingAllowed': True, 'isMarginTradingAllowed': False, 'makerCommission': '0', 'takerCommission': '0.0005',
+             'maxQuoteAmount': '2000000', 'orderTypes': ['LIMIT', 'MARKET', 'LIMIT_MAKER'], 'permissions': ['SPOT']}
+            for market_id in self.ids]}
+
+    # Function to create an order; marketable limit orders fill at once, others rest
+    def create_order(self, params):
+        with self.lock:
+            order_id = str(self.next_order_id)
+            self.next_order_id += 1
+        market_id, side = params.get('symbol'), params.get('side', 'BUY')
+        price = float(params.get('price') or self.last(market_id))
+        quantity = float(params.get('quantity') or 0)
+        last = self.last(market_id)
+        filled = (side == 'BUY' and price >= last) or (side == 'SELL' and price <= last)
+        order = {'symbol': market_id, 'orderId': order_id, 'orderListId': -1, 'clientOrderId': '', 'price': str(price),
+                 'origQty': str(quantity), 'executedQty': str(quantity if filled else 0), 'cummulativeQuoteQty': str(quantity * price if filled else 0),
+                 'status': 'FILLED' if filled else 'NEW', 'timeInForce': None, 'type': params.get('type', 'LIMIT'), 'side': side,
+                 'time': int(time.time() * 1000), 'updateTime': int(time.time() * 1000), 'isWorking': True}
+        self.orders[order_id] = order
+        return {**order, 'transactTime': order['time']}
+
+# Function to build the mock request handler with latency, jitter and errors
+def make_mock_handler(market, latency, jitter, error_rate, counts):
+    class MockHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def _params(self):
+            url = urlparse(self.path)
+            params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            length = int(self.headers.get('Content-Length') or 0)
+            if length:
+                body = self.rfile.read(length).decode()
+                params.update({key: values[-1] for key, values in parse_qs(body).items()})
+            return url.path, params
+
+        def _reply(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _handle(self, method):
+            path, params = self._params()
+            if path == '/__stats':
+                snapshot = dict(counts)
+                if params.get('reset'):
+                    counts.clear()
+                return self._reply(200, snapshot)
+            counts[f"{method} {path}"] += 1
+            time.sleep(max(0.0, latency + random.uniform(-jitter, jitter)))
+            if random.random() < error_rate:
+                counts['errors'] += 1
+                return self._reply(503, {'code': 503, 'msg': 'Service unavailable (injected)'})
+            market_id = params.get('symbol')
+            if path == '/api/v3/klines':
+                return self._reply(200, market.klines(market_id, params['interval'],
+                                                      int(params['startTime']) if 'startTime' in params else None,
+                                                      int(params.get('limit', 500))))
+            if path == '/api/v3/ticker/24hr':
+                return self._reply(200, market.ticker(market_id) if market_id else [market.ticker(m) for m in market.ids])
+            if path == '/api/v3/ticker/bookTicker':
+                tickers = [market.ticker(m) for m in ([market_id] if market_id else market.ids)]
+                return self._reply(200, tickers[0] if market_id else tickers)
+            if path == '/api/v3/depth':
+                return self._reply(200, market.depth(market_id, int(params.get('limit', 20))))
+            if path == '/api/v3/exchangeInfo':
+                return self._reply(200, market.exchange_info())
+            if path == '/api/v3/time':
+                return self._reply(200, {'serverTime': int(time.time() * 1000)})
+            if path == '/api/v3/capital/config/getall':
+                return self._reply(200, [])
+            if path == '/api/v1/contract/detail':
+                return self._reply(200, {'success': True, 'code': 0, 'data': []})
+            if path == '/api/v3/account':
+                return self._reply(200, {'canTrade': True, 'canWithdraw': True, 'canDeposit': True, 'updateTime': None,
+                                         'accountType': 'SPOT', 'balances': [{'asset': 'USDT', 'free': '10000', 'locked': '0'}],
+                                         'permissions': ['SPOT']})
+            if path == '/api/v3/order':
+                if method == 'POST':
+                    return self._reply(200, market.create_order(params))
+                order = market.orders.get(params.get('orderId'))
+                if order is None:
+                    return self._reply(400, {'code': -2013, 'msg': 'Order does not exist.'})
+                if method == 'DELETE' and order['status'] == 'NEW':
+                    order['status'] = 'CANCELED'
+                return self._reply(200, order)
+            if path == '/api/v3/openOrders':
+                return self._reply(200, [order for order in market.orders.values() if order['status'] == 'NEW'
+                                         and (market_id is None or order['symbol'] == market_id)])
+            counts[f"unknown {path}"] += 1
+            return self._reply(404, {'code': 404, 'msg': f"{path} is not mocked"})
+
+        def do_GET(self):
+            self._handle('GET')
+
+        def do_POST(self):
+            self._handle('POST')
+
+        def do_DELETE(self):
+            self._handle('DELETE')
+
+        def log_message(self, format, *args):
+            pass
+
+    return MockHandler
+
+# Function to run the mock exchange until the process is terminated
+def serve_mock(port, count, latency, jitter, error_rate, ready):
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_mock_handler(MockMarket(count), latency, jitter, error_rate, Counter()))
+    server.daemon_threads = True
+    ready.set()
+    server.serve_forever()
+
+# Function to start the mock exchange in a child process; returns (process, base url)
+def start_mock(count, latency=0.02, jitter=0.01, error_rate=0.0, port=0):
+    if port == 0:
+        import socket
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+    ready = multiprocessing.Event()
+    process = multiprocessing.Process(target=serve_mock, args=(port, count, latency, jitter, error_rate, ready), daemon=True)
+    process.start()
+    ready.wait(10)
+    return process, f"http://127.0.0.1:{port}"
+
+def mock_stats(session, url, reset=True):
+    return session.get(f"{url}/__stats", params={'reset': 1} if reset else {}).json()
+
+# Function to return this process's resident memory in MB
+def rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+# Function to point TBOT_LENV at the mock exchange and return the instrumented bot module
+def prepare_bot(url):
+    os.environ.setdefault('TBOT_JOURNAL_PATH', ':memory:')
+    os.environ.setdefault('TBOT_STRATEGY_PATH', os.devnull + '.toml')
+    os.environ.setdefault('MEXC_API_KEY', 'load-test')
+    os.environ.setdefault('MEXC_SECRET_KEY', 'load-test')
+    import ccxt
+    import TBOT_LENV as bot
+    from fast_ohlcv import FastKlineClient
+    exchange = ccxt.mexc({'apiKey': 'load-test', 'secret': 'load-test', 'enableRateLimit': True})
+    exchange.urls['api']['spot'] = {'public': url, 'private': url}
+    exchange.urls['api']['contract'] = {'public': f"{url}/api/v1/contract", 'private': f"{url}/api/v1/private"}
+    bot.exchange = exchange
+    bot.order_tracker.exchange = exchange
+    bot.kline_client = FastKlineClient(url=url)
+    return bot
+
+# Function to run `cycles` bot cycles on a watchlist of `count` symbols and summarize them
+def run_level(bot, url, count, cycles, stage_stats):
+    from trade_journal import TradeJournal
+    bot.symbols = mock_symbols(count)
+    bot.candle_buffers.clear()
+    bot.journal = TradeJournal(':memory:')
+    session = bot.kline_client.session
+    results = []
+    for cycle in range(cycles):
+        for stats in stage_stats.values():
+            stats[0], stats[1] = 0, 0.0
+        mock_stats(session, url)
+        bot.current_trade = None
+        wall, cpu = time.perf_counter(), time.process_time()
+        bot.order_tracker.poll()
+        bot.run_cycle()
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        calls = mock_stats(session, url)
+        results.append({'wall': wall, 'cpu': cpu, 'calls': calls, 'stages': {name: stats[1] for name, stats in stage_stats.items()}})
+    warm = results[1:] or results
+    stages = Counter()
+    for result in warm:
+        stages.update(result['stages'])
+    return {
+        'symbols': count, 'cold_wall': results[0]['wall'], 'cold_cpu': results[0]['cpu'],
+        'warm_wall': sum(r['wall'] for r in warm) / len(warm), 'warm_cpu': sum(r['cpu'] for r in warm) / len(warm),
+        'calls_per_cycle': sum(sum(v for k, v in r['calls'].items() if k != 'errors' and not k.startswith('unknown'))
+                               for r in warm) / len(warm),
+        'errors_per_cycle': sum(r['calls'].get('errors', 0) for r in warm) / len(warm),
+        'endpoints': {name: calls / len(warm) for name, calls in sum((Counter(r['calls']) for r in warm), Counter()).items()},
+        'rss_mb': rss_mb(), 'stages': {name: seconds / len(warm) for name, seconds in stages.items()},
+    }
+
+def print_report(levels):
+    print(f"{'symbols':>8} {'cold s':>8} {'warm s':>8} {'cpu s':>7} {'calls':>7} {'errors':>7} {'rss MB':>7}  bottleneck")
+    for level in levels:
+        stage, seconds = max(level['stages'].items(), key=lambda item: item[1], default=('-', 0.0))
+        share = seconds / level['warm_wall'] if level['warm_wall'] else 0.0
+        print(f"{level['symbols']:>8} {level['cold_wall']:8.2f} {level['warm_wall']:8.2f} {level['warm_cpu']:7.2f} "
+              f"{level['calls_per_cycle']:7.0f} {level['errors_per_cycle']:7.1f} {level['rss_mb']:7.0f}  {stage} ({share:.0%} of cycle)")
+    for level in levels:
+        print(f"\n{level['symbols']} symbols, per warm cycle:")
+        for name, seconds in sorted(level['stages'].items(), key=lambda item: -item[1]):
+            if seconds:
+                print(f"  {name:<36} {seconds * 1000:9.1f} ms")
+        for endpoint, calls in sorted(level['endpoints'].items(), key=lambda item: -item[1]):
+            print(f"  {endpoint:<36} {calls:9.1f} calls")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test TBOT_LENV against a local mock MEXC API.")
+    parser.add_argument('--symbols', default='10,100,1000', help="Comma-separated watchlist sizes")
+    parser.add_argument('--cycles', type=int, default=3, help="Cycles per size; the first one is the cold start")
+    parser.add_argument('--latency', type=float, default=0.02, help="Mock response latency in seconds")
+    parser.add_argument('--jitter', type=float, default=0.01, help="Uniform +/- jitter in seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests answered with HTTP 503")
+    parser.add_argument('--json', help="Also write the results to this file")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.symbols.split(',')]
+    process, url = start_mock(max(sizes), args.latency, args.jitter, args.error_rate)
+    try:
+        bot = prepare_bot(url)
+        from replay import instrument
+        stage_stats = instrument(bot, ('fetch_data', 'calculate_rsi', 'calculate_atr', 'moving_average_cross',
+                                       'identify_range_break', 'fetch_order_books', 'calculate_position_size', 'place_order'))
+        levels = []
+        for size in sizes:
+            logging.getLogger().info(f"Load test with {size} symbols...")
+            levels.append(run_level(bot, url, size, args.cycles, stage_stats))
+        print_report(levels)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(levels, f, indent=2)
+    finally:
+        process.terminate()
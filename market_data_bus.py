@@ -0,0 +1,390 @@
+import os
+import time
+import logging
+import argparse
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+
+from candle_buffer import CandleRingBuffer, store_rows, fields
+from fast_ohlcv import FastKlineClient
+from multi_timeframe import timeframe_to_ms
+from strategy_config import read_config_file
+
+# Shared-memory market data bus for several bot processes on one host. A single feeder process
+# fetches candles and tickers once and publishes them into one multiprocessing.shared_memory
+# segment; every bot attaches read-only and reads the candle ring buffers in place, so API load
+# and memory do not grow with the number of strategy processes.
+#
+# Segment layout (all sections 8-byte aligned):
+#   header    int64[8]   magic, layout version, channels, capacity, tickers, heartbeat ms, refresh period ms
+#   names     channel names 'SYMBOL|TIMEFRAME' then ticker symbols, 48 bytes each
+#   channels  int64[n, 4] seq, written, count, updated ms
+#             then per channel: int64 timestamps[2 * capacity], float64 open..volume[5, 2 * capacity],
+#             uint8 flags[2 * capacity], i.e. the CandleRingBuffer double-write layout
+#   tickers   int64[m, 2] seq, updated ms; float64[m, 6] bid, ask, last, high, low, timestamp
+#
+# Consistency uses a seqlock per channel/ticker: the single writer makes seq odd while it
+# writes and even when done, and a reader accepts data only if seq was even and unchanged
+# around its read. Readers never block the writer and never take a lock.
+#
+# The heartbeat only advances after a loop in which something was refreshed, and each channel
+# and ticker carries its own update time; readers treat data older than two refresh periods as
+# stale and return None, so a bot falls back to REST instead of trading on frozen candles.
+
+magic = 0x54424F5442555331  # 'TBOTBUS1'
+layout_version = 1
+name_bytes = 48
+ticker_fields = ('bid', 'ask', 'last', 'high', 'low', 'timestamp')
+
+def _align(offset):
+    return (offset + 7) // 8 * 8
+
+# Function to map every section of a segment onto NumPy arrays
+def _map_segment(buffer, channels, capacity, tickers):
+    arrays = {'header': np.ndarray(8, np.int64, buffer, 0)}
+    offset = 64
+    arrays['names'] = np.ndarray((channels + tickers,), f'S{name_bytes}', buffer, offset)
+    offset = _align(offset + (channels + tickers) * name_bytes)
+    arrays['channel_meta'] = np.ndarray((channels, 4), np.int64, buffer, offset)
+    offset += channels * 4 * 8
+    rows = 2 * capacity
+    arrays['timestamps'] = np.ndarray((channels, rows), np.int64, buffer, offset)
+    offset += channels * rows * 8
+    arrays['values'] = np.ndarray((channels, len(fields), rows), np.float64, buffer, offset)
+    offset += channels * len(fields) * rows * 8
+    arrays['flags'] = np.ndarray((channels, rows), np.uint8, buffer, offset)
+    offset = _align(offset + channels * rows)
+    arrays['ticker_meta'] = np.ndarray((tickers, 2), np.int64, buffer, offset)
+    offset += tickers * 2 * 8
+    arrays['ticker_values'] = np.ndarray((tickers, len(ticker_fields)), np.float64, buffer, offset)
+    return arrays
+
+# Function to compute the byte size of a segment (same arithmetic as _map_segment)
+def segment_size(channels, capacity, tickers):
+    rows = 2 * capacity
+    offset = _align(64 + (channels + tickers) * name_bytes)
+    offset += channels * 4 * 8 + channels * rows * 8 + channels * len(fields) * rows * 8
+    offset = _align(offset + channels * rows)
+    return offset + tickers * 2 * 8 + tickers * len(ticker_fields) * 8
+
+# CandleRingBuffer whose storage and counters live in the shared segment (writer side)
+class SharedCandleBuffer(CandleRingBuffer):
+    def __init__(self, arrays, index, capacity):
+        self.capacity = capacity
+        self.meta = arrays['channel_meta'][index]
+        self.timestamps = arrays['timestamps'][index]
+        self.values = {field: arrays['values'][index, column] for column, field in enumerate(fields)}
+        self.flags = arrays['flags'][index]
+
+    @property
+    def written(self):
+        return int(self.meta[1])
+
+    @written.setter
+    def written(self, value):
+        self.meta[1] = value
+
+    @property
+    def count(self):
+        return int(self.meta[2])
+
+    @count.setter
+    def count(self, value):
+        self.meta[2] = value
+
+# Read handle on one channel: zero-copy views bounded by the state captured at open time
+class SharedCandleView:
+    def __init__(self, buffer, seq, written, count):
+        self.buffer = buffer
+        self.seq = seq
+        self.written = written
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def last_timestamp(self):
+        return int(self.view('timestamp')[-1]) if self.count else None
+
+    # Function to return a zero-copy view of one column, oldest first
+    def view(self, field):
+        capacity = self.buffer.capacity
+        end = (self.written - 1) % capacity + capacity + 1
+        start = end - self.count
+        if field == 'timestamp':
+            return self.buffer.timestamps[start:end]
+        if field == 'flags':
+            return self.buffer.flags[start:end]
+        return self.buffer.values[field][start:end]
+
+    # Function to check that the feeder has not written to the channel since this view was opened
+    def stable(self):
+        return int(self.buffer.meta[0]) == self.seq
+
+    to_frame = CandleRingBuffer.to_frame
+
+# Function to create a new segment (feeder) or attach to an existing one (reader)
+def _open_segment(name, create=False, size=0):
+    if create:
+        try:
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+        return shared_memory.SharedMemory(name=name, create=True, size=size)
+    segment = shared_memory.SharedMemory(name=name)
+    # Python < 3.13 registers attached segments too and would unlink them when a reader exits
+    try:
+        resource_tracker.unregister(segment._name, 'shared_memory')
+    except Exception:
+        pass
+    return segment
+
+class MarketDataFeeder:
+    def __init__(self, exchange, name, symbols, timeframes, capacity=200):
+        self.exchange = exchange
+        self.name = name
+        self.symbols = list(symbols)
+        self.channels = [(symbol, timeframe) for symbol in self.symbols for timeframe in timeframes]
+        self.capacity = capacity
+        self.segment = _open_segment(name, create=True, size=segment_size(len(self.channels), capacity, len(self.symbols)))
+        self.arrays = _map_segment(self.segment.buf, len(self.channels), capacity, len(self.symbols))
+        self.arrays['names'][:] = [f"{symbol}|{timeframe}".encode() for symbol, timeframe in self.channels] + \
+                                  [symbol.encode() for symbol in self.symbols]
+        self.buffers = [SharedCandleBuffer(self.arrays, index, capacity) for index in range(len(self.channels))]
+        self.kline_client = FastKlineClient() if getattr(exchange, 'id', None) == 'mexc' else None
+        header = self.arrays['header']
+        header[1:6] = [layout_version, len(self.channels), capacity, len(self.symbols), 0]
+        header[0] = magic  # Written last: readers reject the segment until the layout is complete
+        logging.info(f"Market data bus '{name}' created: {len(self.channels)} channels, {len(self.symbols)} tickers, "
+                     f"{self.segment.size / 1e6:.2f} MB")
+
+    def _fetch_rows(self, symbol, timeframe, since):
+        if self.kline_client is not None:
+            try:
+                return self.kline_client.fetch_ohlcv_array(symbol, timeframe, since=since, limit=self.capacity)
+            except Exception as e:
+                logging.warning(f"Fast kline fetch failed for {symbol}, falling back to ccxt: {e}")
+        return self.exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=self.capacity)
+
+    # Function to refresh one channel; the network call happens before the write section opens
+    def refresh_channel(self, index):
+        symbol, timeframe = self.channels[index]
+        buffer = self.buffers[index]
+        meta = buffer.meta
+        since = buffer.last_timestamp()
+        reload = since is not None and time.time() * 1000 - since > buffer.capacity * timeframe_to_ms(timeframe)
+        if reload:
+            logging.info(f"{symbol} buffer is older than its capacity. Reloading.")
+            since = None
+        rows = self._fetch_rows(symbol, timeframe, since)
+        meta[0] += 1
+        try:
+            if reload:
+                buffer.clear()
+            store_rows(buffer, rows, symbol, timeframe)
+            meta[3] = int(time.time() * 1000)
+        finally:
+            meta[0] += 1
+
+    # Function to publish tickers for every symbol from one batched request
+    def refresh_tickers(self):
+        tickers = self.exchange.fetch_tickers(self.symbols)
+        meta, values = self.arrays['ticker_meta'], self.arrays['ticker_values']
+        for index, symbol in enumerate(self.symbols):
+            ticker = tickers.get(symbol)
+            if not ticker:
+                continue
+            row = [ticker.get(field) if ticker.get(field) is not None else np.nan for field in ticker_fields]
+            meta[index, 0] += 1
+            values[index] = row
+            meta[index, 1] = int(time.time() * 1000)
+            meta[index, 0] += 1
+
+    def run(self, interval=10):
+        header = self.arrays['header']
+        header[6] = int(interval * 1000)
+        while True:
+            started = time.monotonic()
+            refreshed = 0
+            for index in range(len(self.channels)):
+                try:
+                    self.refresh_channel(index)
+                    refreshed += 1
+                except Exception as e:
+                    logging.error(f"Feeder failed to refresh {self.channels[index]}: {e}")
+            try:
+                self.refresh_tickers()
+                refreshed += 1
+            except Exception as e:
+                logging.error(f"Feeder failed to refresh tickers: {e}")
+            elapsed = time.monotonic() - started
+            # Readers derive staleness from the real loop period, which grows with the channel count
+            header[6] = int(max(interval, elapsed) * 1000)
+            if refreshed:
+                header[5] = int(time.time() * 1000)
+            time.sleep(max(0.0, interval - elapsed))
+
+    def close(self):
+        self.arrays = None
+        self.buffers = []
+        self.segment.close()
+        self.segment.unlink()
+
+class MarketDataReader:
+    def __init__(self, name, max_age=120, spin_limit=1000):
+        self.name = name
+        self.max_age = max_age
+        self.spin_limit = spin_limit
+        self.segment = None
+        self.next_attach = 0.0
+        self._attach()
+
+    def _attach(self):
+        self.next_attach = time.monotonic() + 10
+        try:
+            segment = _open_segment(self.name)
+        except FileNotFoundError:
+            self.segment = None
+            return False
+        header = np.ndarray(8, np.int64, segment.buf, 0)
+        if header[0] != magic or header[1] != layout_version:
+            segment.close()
+            self.segment = None
+            return False
+        channels, capacity, tickers = int(header[2]), int(header[3]), int(header[4])
+        self.segment = segment
+        self.arrays = _map_segment(segment.buf, channels, capacity, tickers)
+        names = [name.decode() for name in self.arrays['names']]
+        self.channels = {name: index for index, name in enumerate(names[:channels])}
+        self.tickers = {name: index for index, name in enumerate(names[channels:])}
+        self.buffers = {}
+        self.capacity = capacity
+        return True
+
+    def _fresh(self):
+        heartbeat = int(self.arrays['header'][5])
+        return bool(heartbeat) and time.time() * 1000 - heartbeat <= self.max_age * 1000
+
+    # Function to check a channel/ticker update time against two feeder refresh periods
+    def _recent(self, updated_ms):
+        period = int(self.arrays['header'][6])
+        limit = 2 * period if period else self.max_age * 1000
+        return bool(updated_ms) and time.time() * 1000 - updated_ms <= limit
+
+    # Function to confirm the feeder is alive; reattaches (at most every 10 s) after a feeder restart
+    def healthy(self):
+        if self.segment is not None and self._fresh():
+            return True
+        if time.monotonic() >= self.next_attach:
+            if self.segment is not None:
+                self.close()
+            return self._attach() and self._fresh()
+        return False
+
+    # Function to open a consistent zero-copy view of a channel, or None if it is not published
+    def candles(self, symbol, timeframe):
+        if not self.healthy():
+            return None
+        index = self.channels.get(f"{symbol}|{timeframe}")
+        if index is None:
+            return None
+        buffer = self.buffers.get(index)
+        if buffer is None:
+            buffer = self.buffers[index] = SharedCandleBuffer(self.arrays, index, self.capacity)
+        meta = buffer.meta
+        for _ in range(self.spin_limit):
+            seq = int(meta[0])
+            if seq % 2:
+                continue
+            written, count, updated = int(meta[1]), int(meta[2]), int(meta[3])
+            if int(meta[0]) == seq:
+                if not count or not self._recent(updated):
+                    return None
+                return SharedCandleView(buffer, seq, written, count)
+        return None
+
+    # Function to return a DataFrame copy of the last `rows` candles, retried until consistent
+    def frame(self, symbol, timeframe, rows=None):
+        for _ in range(3):
+            view = self.candles(symbol, timeframe)
+            if view is None:
+                return None
+            df = view.to_frame()
+            if view.stable():
+                return df.iloc[-rows:].reset_index(drop=True) if rows else df
+        return None
+
+    # Function to return a ccxt-style ticker dict from the bus, or None
+    def ticker(self, symbol):
+        if not self.healthy():
+            return None
+        index = self.tickers.get(symbol)
+        if index is None:
+            return None
+        meta, values = self.arrays['ticker_meta'][index], self.arrays['ticker_values'][index]
+        for _ in range(self.spin_limit):
+            seq = int(meta[0])
+            if seq % 2:
+                continue
+            row, updated = values.tolist(), int(meta[1])
+            if int(meta[0]) == seq:
+                if not self._recent(updated):
+                    return None
+                ticker = dict(zip(ticker_fields, row))
+                ticker['symbol'] = symbol
+                ticker['close'] = ticker['last']
+                return ticker
+        return None
+
+    # Function to map symbols to last prices, leaving out symbols the bus does not carry
+    def prices(self, symbols):
+        prices = {}
+        for symbol in symbols:
+            ticker = self.ticker(symbol)
+            if ticker is not None and ticker['last'] == ticker['last']:
+                prices[symbol] = ticker['last']
+        return prices
+
+    def close(self):
+        if self.segment is not None:
+            self.arrays = None
+            self.buffers = {}
+            try:
+                self.segment.close()
+            except BufferError:
+                pass  # A caller still holds views; the mapping is released with them
+            self.segment = None
+
+# Function to attach to a running feeder's bus, or return None (no name given or no feeder)
+def attach_reader(name, max_age=120):
+    if not name:
+        return None
+    reader = MarketDataReader(name, max_age)
+    if reader.segment is None:
+        logging.warning(f"Market data bus '{name}' is not available yet; fetching directly until it appears.")
+    return reader
+
+if __name__ == "__main__":
+    import ccxt
+    parser = argparse.ArgumentParser(description="Publish candles and tickers to shared memory for local bots.")
+    parser.add_argument('--name', default=os.getenv('TBOT_MARKET_BUS', 'tbot_market_bus'))
+    parser.add_argument('--strategy', default='strategy.toml', help="Watchlist to publish (BTC/USDT is always included)")
+    parser.add_argument('--symbols', help="Comma-separated symbols instead of the strategy watchlist")
+    parser.add_argument('--timeframes', default='15m', help="Comma-separated timeframes")
+    parser.add_argument('--capacity', type=int, default=200, help="Candles kept per channel")
+    parser.add_argument('--interval', type=float, default=10, help="Seconds between refreshes")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.symbols:
+        symbols = args.symbols.split(',')
+    else:
+        symbols = read_config_file(args.strategy)['symbols'] if os.path.exists(args.strategy) else []
+        symbols = list(dict.fromkeys(['BTC/USDT'] + symbols))
+    exchange = ccxt.mexc({'apiKey': os.getenv('MEXC_API_KEY'), 'secret': os.getenv('MEXC_SECRET_KEY'), 'enableRateLimit': True})
+    feeder = MarketDataFeeder(exchange, args.name, symbols, args.timeframes.split(','), args.capacity)
+    try:
+        feeder.run(args.interval)
+    finally:
+        feeder.close()
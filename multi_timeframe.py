@@ -0,0 +1,135 @@
+import time
+import logging
+from collections import deque
+
+import pandas as pd
+
+# Derive higher timeframes locally from a single base-timeframe OHLCV feed.
+# Only the finest timeframe is fetched from the exchange; every other timeframe
+# is built by incremental aggregation, so extra timeframes cost no API weight.
+# A higher-timeframe candle is only emitted once it holds every base candle of its
+# period; a bucket entered mid-way (feed started late) or cut short by a gap in the
+# base feed would carry the wrong open/high/low and is dropped instead.
+
+timeframe_units = {'m': 60, 'h': 3600, 'd': 86400}
+
+# Function to convert a ccxt timeframe string ('1m', '15m', '4h', '1d') to milliseconds
+def timeframe_to_ms(timeframe):
+    amount, unit = timeframe[:-1], timeframe[-1]
+    if unit not in timeframe_units or not amount.isdigit() or int(amount) <= 0:
+        raise ValueError(f"Unsupported timeframe for local aggregation: {timeframe}")
+    return int(amount) * timeframe_units[unit] * 1000
+
+# Function to merge a newer candle into an aggregated candle
+def merge_candle(bucket, bar):
+    return [bucket[0], bucket[1], max(bucket[2], bar[2]), min(bucket[3], bar[3]), bar[4], bucket[5] + bar[5]]
+
+class TimeframeAggregator:
+    def __init__(self, base_timeframe, timeframes, max_bars=1000):
+        self.base_timeframe = base_timeframe
+        self.base_ms = timeframe_to_ms(base_timeframe)
+        self.tf_ms = {}
+        for tf in timeframes:
+            tf_ms = timeframe_to_ms(tf)
+            if tf_ms % self.base_ms != 0:
+                raise ValueError(f"Timeframe {tf} is not a multiple of base timeframe {base_timeframe}")
+            self.tf_ms[tf] = tf_ms
+        self.tf_ms.setdefault(base_timeframe, self.base_ms)
+        # Completed candles per timeframe, bounded so memory stays flat
+        self.closed = {tf: deque(maxlen=max_bars) for tf in self.tf_ms}
+        # Bucket currently being built from closed base candles, and how many base candles it holds
+        self.current = {tf: None for tf in self.tf_ms}
+        self.counts = {tf: 0 for tf in self.tf_ms}
+        self.dropped = {tf: 0 for tf in self.tf_ms}
+        # Latest base candle that has not closed yet (replaced on every update)
+        self.forming = None
+        self.last_closed_ts = None
+
+    # Function to ingest base candles as returned by exchange.fetch_ohlcv
+    def update(self, bars, now_ms=None):
+        if now_ms is None:
+            now_ms = int(time.time() * 1000)
+        for bar in bars:
+            bar = [int(bar[0])] + [float(x) for x in bar[1:6]]
+            ts = bar[0]
+            if self.last_closed_ts is not None and ts <= self.last_closed_ts:
+                continue  # Already aggregated, or an out-of-order duplicate
+            if ts + self.base_ms <= now_ms:
+                self._add_closed(bar)
+                self.last_closed_ts = ts
+                if self.forming is not None and self.forming[0] <= ts:
+                    self.forming = None
+            else:
+                self.forming = bar
+
+    def _add_closed(self, bar):
+        ts = bar[0]
+        for tf, tf_ms in self.tf_ms.items():
+            start = ts - ts % tf_ms
+            bucket = self.current[tf]
+            if bucket is not None and bucket[0] != start:
+                # A gap in the base feed skipped the last slot of the previous bucket
+                self._drop_incomplete(tf, bucket)
+                bucket = None
+            if bucket is None:
+                bucket = [start] + bar[1:]
+                self.counts[tf] = 1
+            else:
+                bucket = merge_candle(bucket, bar)
+                self.counts[tf] += 1
+            if ts + self.base_ms == start + tf_ms:
+                # Last base slot of this bucket has closed; the candle is final if no slot was missed
+                if self.counts[tf] == tf_ms // self.base_ms:
+                    self.closed[tf].append(bucket)
+                else:
+                    self._drop_incomplete(tf, bucket)
+                bucket = None
+            self.current[tf] = bucket
+
+    def _drop_incomplete(self, tf, bucket):
+        self.dropped[tf] += 1
+        logging.debug(f"Dropped {tf} candle at {bucket[0]}: {self.counts[tf]} of {self.tf_ms[tf] // self.base_ms} base candles")
+
+    # Function to check that the open bucket holds every base candle since its start
+    def _bucket_complete(self, timeframe):
+        bucket = self.current[timeframe]
+        return bucket is not None and self.counts[timeframe] == (self.last_closed_ts - bucket[0]) // self.base_ms + 1
+
+    # Function to return the partial (still-forming) candle for a timeframe, or None
+    def partial_candle(self, timeframe):
+        tf_ms = self.tf_ms[timeframe]
+        bucket = self.current[timeframe] if self._bucket_complete(timeframe) else None
+        if self.forming is None:
+            return list(bucket) if bucket is not None else None
+        start = self.forming[0] - self.forming[0] % tf_ms
+        if bucket is not None and bucket[0] == start and self.forming[0] == self.last_closed_ts + self.base_ms:
+            return merge_candle(bucket, self.forming)
+        if self.forming[0] == start:
+            return [start] + self.forming[1:]
+        return None  # Bucket is missing base candles before the forming one
+
+    # Function to return candles as [timestamp, open, high, low, close, volume] lists
+    def candles(self, timeframe, include_partial=True):
+        if timeframe not in self.tf_ms:
+            raise KeyError(f"Timeframe {timeframe} is not aggregated by this instance")
+        rows = [list(bar) for bar in self.closed[timeframe]]
+        if include_partial:
+            partial = self.partial_candle(timeframe)
+            if partial is not None and (not rows or partial[0] > rows[-1][0]):
+                rows.append(partial)
+        return rows
+
+    # Function to build a DataFrame shaped like fetch_data() output, plus a 'partial' flag
+    def to_frame(self, timeframe, include_partial=True):
+        rows = self.candles(timeframe, include_partial=False)
+        partial_flags = [False] * len(rows)
+        if include_partial:
+            partial = self.partial_candle(timeframe)
+            if partial is not None and (not rows or partial[0] > rows[-1][0]):
+                rows.append(partial)
+                partial_flags.append(True)
+        df = pd.DataFrame(rows, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+        df['partial'] = partial_flags
+        logging.debug(f"Built {len(df)} {timeframe} candles from {self.base_timeframe} base feed")
+        return df
@@ -0,0 +1,83 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+# Order-book aware execution helpers: price limit orders from the live best bid/ask,
+# estimate slippage for the requested size, and fetch books for many symbols at once.
+
+# Function to fetch order books for several symbols in as few requests as possible
+def fetch_order_books(exchange, symbols, limit=20, max_workers=8):
+    symbols = list(symbols)
+    if not symbols:
+        return {}
+    if exchange.has.get('fetchOrderBooks'):
+        try:
+            return exchange.fetch_order_books(symbols, limit)
+        except Exception as e:
+            logging.warning(f"Bulk order book fetch failed, falling back to per-symbol requests: {e}")
+
+    def fetch_one(symbol):
+        try:
+            return symbol, exchange.fetch_order_book(symbol, limit)
+        except Exception as e:
+            logging.error(f"Error fetching order book for {symbol}: {e}")
+            return symbol, None
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(symbols))) as pool:
+        return {symbol: book for symbol, book in pool.map(fetch_one, symbols) if book is not None}
+
+# Function to return (best_bid, best_ask) from a ccxt order book
+def best_bid_ask(book):
+    bid = book['bids'][0][0] if book.get('bids') else None
+    ask = book['asks'][0][0] if book.get('asks') else None
+    return bid, ask
+
+# Function to walk the book for a market-style fill of `amount` and report the expected cost
+def estimate_fill(book, side, amount):
+    levels = book['asks'] if side == 'buy' else book['bids']
+    bid, ask = best_bid_ask(book)
+    remaining, cost, worst_price = amount, 0.0, None
+    for level in levels:
+        price, size = level[0], level[1]
+        take = min(remaining, size)
+        cost += take * price
+        remaining -= take
+        worst_price = price
+        if remaining <= 0:
+            break
+    filled = amount - max(remaining, 0)
+    average_price = cost / filled if filled else None
+    touch = ask if side == 'buy' else bid
+    slippage = None
+    if average_price is not None and touch:
+        slippage = (average_price - touch) / touch if side == 'buy' else (touch - average_price) / touch
+    return {
+        'filled': filled, 'unfilled': max(remaining, 0), 'average_price': average_price,
+        'worst_price': worst_price, 'slippage': slippage, 'best_bid': bid, 'best_ask': ask,
+    }
+
+# Function to choose a limit price that fills `amount` immediately without crossing more than max_slippage.
+# Returns None when the book is empty or too thin to fill within the slippage budget.
+def limit_price(book, side, amount, max_slippage=0.002):
+    fill = estimate_fill(book, side, amount)
+    touch = fill['best_ask'] if side == 'buy' else fill['best_bid']
+    if touch is None or fill['unfilled'] > 0:
+        return None
+    cap = touch * (1 + max_slippage) if side == 'buy' else touch * (1 - max_slippage)
+    if (side == 'buy' and fill['worst_price'] > cap) or (side == 'sell' and fill['worst_price'] < cap):
+        return None
+    return fill['worst_price']
+
+# Function to price an entry from the live book, falling back to the caller's price when unavailable
+def execution_price(exchange, symbol, side, amount, fallback_price, book=None, max_slippage=0.002):
+    try:
+        if book is None:
+            book = exchange.fetch_order_book(symbol, 20)
+        price = limit_price(book, side, amount, max_slippage)
+        if price is not None:
+            fill = estimate_fill(book, side, amount)
+            logging.info(f"{symbol} {side} {amount}: limit {price}, expected slippage {fill['slippage']:.5f}")
+            return price
+        logging.warning(f"{symbol} book too thin for {side} {amount} within {max_slippage:.3%}. Using fallback price.")
+    except Exception as e:
+        logging.error(f"Error pricing {symbol} from order book: {e}")
+    return fallback_price
@@ -0,0 +1,88 @@
+import time
+import logging
+
+# Tracks every order the bot placed with one fetch_open_orders() call per poll, instead of a
+# fetch_order() per order. An order that is still open is compared with its last known fill;
+# an order that disappears from the open list is looked up once to learn whether it filled or
+# was canceled. Entries resting longer than their TTL are canceled. Each change is reported to
+# the on_event callback as on_event(event, tracked, order) with event one of
+# 'partial', 'filled', 'canceled' or 'expired'.
+
+class OrderTracker:
+    def __init__(self, exchange, on_event, default_ttl=None):
+        self.exchange = exchange
+        self.on_event = on_event
+        self.default_ttl = default_ttl
+        self.orders = {}
+
+    # Function to start following an order; extra keyword arguments are kept for the callback
+    def track(self, order_id, symbol, side, amount, kind='entry', ttl=None, placed_at=None, **context):
+        self.orders[order_id] = {
+            'id': order_id, 'symbol': symbol, 'side': side, 'amount': amount, 'kind': kind,
+            'ttl': ttl if ttl is not None else (self.default_ttl if kind == 'entry' else None),
+            'placed_at': placed_at if placed_at is not None else time.time(), 'filled': 0.0, **context,
+        }
+
+    def untrack(self, order_id):
+        return self.orders.pop(order_id, None)
+
+    def __len__(self):
+        return len(self.orders)
+
+    def _emit(self, event, tracked, order):
+        try:
+            self.on_event(event, tracked, order)
+        except Exception as e:
+            logging.error(f"Handling {event} for order {tracked['id']} on {tracked['symbol']} failed: {e}")
+
+    # Function to resolve an order that left the open list: filled or canceled
+    def _finish(self, tracked):
+        order = self.exchange.fetch_order(tracked['id'], tracked['symbol'])
+        if order.get('status') == 'open':
+            return  # Open-orders snapshot raced with a new order; check again next poll
+        self.orders.pop(tracked['id'], None)
+        filled = order.get('filled') or 0.0
+        if order.get('status') == 'closed' or filled >= tracked['amount'] * (1 - 1e-9):
+            self._emit('filled', tracked, order)
+        else:
+            self._emit('canceled', tracked, order)
+
+    # Function to cancel an entry that rested longer than its TTL, reporting any partial fill
+    def _expire(self, tracked):
+        try:
+            self.exchange.cancel_order(tracked['id'], tracked['symbol'])
+        except Exception as e:
+            logging.warning(f"Cancel of stale order {tracked['id']} on {tracked['symbol']} failed: {e}")
+            return
+        try:
+            order = self.exchange.fetch_order(tracked['id'], tracked['symbol'])
+        except Exception:
+            order = {'id': tracked['id'], 'status': 'canceled', 'filled': tracked['filled']}
+        self.orders.pop(tracked['id'], None)
+        logging.info(f"{tracked['kind'].capitalize()} order {tracked['id']} on {tracked['symbol']} expired after {tracked['ttl']}s.")
+        self._emit('filled' if order.get('status') == 'closed' else 'expired', tracked, order)
+
+    # Function to refresh every tracked order with a single open-orders call
+    def poll(self):
+        if not self.orders:
+            return
+        try:
+            open_orders = {order['id']: order for order in self.exchange.fetch_open_orders()}
+        except Exception as e:
+            logging.error(f"Error fetching open orders: {e}")
+            return
+        now = time.time()
+        for tracked in list(self.orders.values()):
+            order = open_orders.get(tracked['id'])
+            try:
+                if order is None:
+                    self._finish(tracked)
+                    continue
+                filled = order.get('filled') or 0.0
+                if filled > tracked['filled']:
+                    tracked['filled'] = filled
+                    self._emit('partial', tracked, order)
+                if tracked['ttl'] is not None and now - tracked['placed_at'] > tracked['ttl']:
+                    self._expire(tracked)
+            except Exception as e:
+                logging.error(f"Error updating order {tracked['id']} on {tracked['symbol']}: {e}")
@@ -0,0 +1,305 @@
+import os
+import sys
+import time
+import types
+import bisect
+import logging
+import argparse
+import datetime
+import importlib
+
+from multi_timeframe import TimeframeAggregator, timeframe_to_ms
+from trade_journal import TradeJournal
+from backfill import open_store, load_candles
+from data_quality import clean_ohlcv, log_report
+
+# Replay recorded candles through a live bot's real decision path. The bot module's
+# datetime/time references are swapped for a virtual clock and its exchange for a simulated
+# one, so hours of market data run in seconds with no network and deterministic results.
+# Candles for the bot's timeframe are built from closed base (e.g. 1m) candles only, so the
+# still-forming candle the bot sees never contains future prices.
+
+class ReplayFinished(Exception):
+    pass
+
+class VirtualClock:
+    def __init__(self, start_ms, end_ms, poll_step=1.0):
+        self.now_ms = start_ms
+        self.end_ms = end_ms
+        self.poll_step = poll_step
+
+    def time(self):
+        return self.now_ms / 1000
+
+    def advance(self, seconds):
+        self.now_ms += int(seconds * 1000)
+        if self.now_ms > self.end_ms:
+            raise ReplayFinished()
+
+    # Each poll of the clock moves time forward, so busy-wait loops in the bot make progress
+    def tick(self):
+        self.advance(self.poll_step)
+        return self.time()
+
+    def sleep(self, seconds):
+        self.advance(max(seconds, 0))
+
+# Function to build stand-ins for the datetime and time modules driven by the virtual clock.
+# With ticking=False reading the date leaves virtual time where it is.
+def clock_modules(clock, ticking=True):
+    read = clock.tick if ticking else clock.time
+
+    class ReplayDateTime(datetime.datetime):
+        @classmethod
+        def utcnow(cls):
+            return datetime.datetime.fromtimestamp(read(), datetime.timezone.utc).replace(tzinfo=None)
+
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.datetime.fromtimestamp(read(), tz)
+
+    datetime_module = types.SimpleNamespace(datetime=ReplayDateTime, timedelta=datetime.timedelta, timezone=datetime.timezone)
+    time_module = types.SimpleNamespace(time=clock.time, sleep=clock.sleep, monotonic=clock.time,
+                                        perf_counter=time.perf_counter, process_time=time.process_time)
+    return datetime_module, time_module
+
+# Simulated exchange serving recorded base candles up to the virtual clock and filling orders on them
+class ReplayExchange:
+    has = {'fetchTickers': True, 'fetchOrderBooks': False, 'fetchClosedOrders': False, 'fetchPositions': False}
+
+    def __init__(self, candles, base_timeframe, clock, balance=1000.0, spread=0.0005):
+        self.candles = candles
+        self.timestamps = {symbol: [bar[0] for bar in bars] for symbol, bars in candles.items()}
+        self.base_timeframe = base_timeframe
+        self.base_ms = timeframe_to_ms(base_timeframe)
+        self.clock = clock
+        self.balance = balance
+        self.spread = spread
+        self.aggregators = {}
+        self.cursors = {}
+        self.orders = {}
+        self.next_order_id = 1
+        self.matched_until = {symbol: clock.now_ms for symbol in candles}
+        self.api_calls = 0
+
+    # Function to return the number of base candles closed at the current virtual time
+    def _closed_count(self, symbol):
+        return bisect.bisect_right(self.timestamps[symbol], self.clock.now_ms - self.base_ms)
+
+    def _last_price(self, symbol):
+        count = self._closed_count(symbol)
+        if count == 0:
+            raise ValueError(f"No replay data for {symbol} before {self.clock.now_ms}")
+        return self.candles[symbol][count - 1][4]
+
+    def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None, params=None):
+        self.api_calls += 1
+        self._match_orders(symbol)
+        key = (symbol, timeframe)
+        if key not in self.aggregators:
+            self.aggregators[key] = TimeframeAggregator(self.base_timeframe, [timeframe], max_bars=5000)
+            self.cursors[key] = 0
+        count = self._closed_count(symbol)
+        aggregator = self.aggregators[key]
+        aggregator.update(self.candles[symbol][self.cursors[key]:count], now_ms=self.clock.now_ms)
+        self.cursors[key] = count
+        bars = aggregator.candles(timeframe, include_partial=True)
+        if since is not None:
+            bars = [bar for bar in bars if bar[0] >= since]
+        return bars[-limit:] if limit else bars
+
+    def fetch_ticker(self, symbol):
+        self.api_calls += 1
+        count = self._closed_count(symbol)
+        day = self.candles[symbol][max(0, count - 86400000 // self.base_ms):count]
+        last = self._last_price(symbol)
+        return {'symbol': symbol, 'last': last, 'close': last,
+                'bid': last * (1 - self.spread), 'ask': last * (1 + self.spread),
+                'high': max(bar[2] for bar in day), 'low': min(bar[3] for bar in day),
+                'timestamp': self.clock.now_ms}
+
+    def fetch_tickers(self, symbols=None):
+        return {symbol: self.fetch_ticker(symbol) for symbol in (symbols or self.candles)}
+
+    def fetch_order_book(self, symbol, limit=None):
+        self.api_calls += 1
+        last = self._last_price(symbol)
+        return {'symbol': symbol, 'bids': [[last * (1 - self.spread), 1e9]], 'asks': [[last * (1 + self.spread), 1e9]],
+                'timestamp': self.clock.now_ms, 'nonce': None}
+
+    def fetch_balance(self):
+        self.api_calls += 1
+        return {'total': {'USDT': self.balance}, 'free': {'USDT': self.balance}}
+
+    def create_order(self, symbol, order_type, side, amount, price=None, params=None):
+        self.api_calls += 1
+        params = params or {}
+        order = {'id': str(self.next_order_id), 'symbol': symbol, 'type': order_type, 'side': side,
+                 'amount': amount, 'price': price, 'stopPrice': params.get('stopPrice'),
+                 'status': 'open', 'filled': 0.0, 'timestamp': self.clock.now_ms}
+        self.next_order_id += 1
+        self.orders[order['id']] = order
+        logging.info(f"[replay] {side} {amount} {symbol} @ {price} (stop {order['stopPrice']}) at {self.clock.now_ms}")
+        return dict(order)
+
+    def create_limit_buy_order(self, symbol, amount, price, params=None):
+        return self.create_order(symbol, 'limit', 'buy', amount, price, params)
+
+    def create_limit_sell_order(self, symbol, amount, price, params=None):
+        return self.create_order(symbol, 'limit', 'sell', amount, price, params)
+
+    def cancel_order(self, order_id, symbol=None, params=None):
+        self.api_calls += 1
+        self.orders[order_id]['status'] = 'canceled'
+        return dict(self.orders[order_id])
+
+    def fetch_order(self, order_id, symbol=None, params=None):
+        self.api_calls += 1
+        if symbol is not None:
+            self._match_orders(symbol)
+        return dict(self.orders[order_id])
+
+    def fetch_open_orders(self, symbol=None, since=None, limit=None, params=None):
+        self.api_calls += 1
+        for each in ([symbol] if symbol else list(self.candles)):
+            self._match_orders(each)
+        return [dict(order) for order in self.orders.values()
+                if order['status'] == 'open' and (symbol is None or order['symbol'] == symbol)]
+
+    # Function to fill open orders against base candles closed since the last match
+    def _match_orders(self, symbol):
+        start = self.matched_until.get(symbol, self.clock.now_ms)
+        self.matched_until[symbol] = self.clock.now_ms
+        open_orders = [order for order in self.orders.values() if order['symbol'] == symbol and order['status'] == 'open']
+        if not open_orders:
+            return
+        timestamps = self.timestamps[symbol]
+        first = bisect.bisect_left(timestamps, start - self.base_ms)
+        last = self._closed_count(symbol)
+        for bar in self.candles[symbol][first:last]:
+            for order in open_orders:
+                if order['status'] != 'open' or bar[0] < order['timestamp']:
+                    continue
+                stop = order['stopPrice']
+                if stop is not None:
+                    # Protective order: stop checked before take profit, as in the backtest kernels
+                    hit_stop = bar[3] <= stop if order['side'] == 'sell' else bar[2] >= stop
+                    hit_target = bar[2] >= order['price'] if order['side'] == 'sell' else bar[3] <= order['price']
+                    fill_price = stop if hit_stop else order['price']
+                    if not (hit_stop or hit_target):
+                        continue
+                elif (order['side'] == 'buy' and bar[3] <= order['price']) or (order['side'] == 'sell' and bar[2] >= order['price']):
+                    fill_price = order['price']
+                else:
+                    continue
+                order['status'], order['filled'], order['average'] = 'closed', order['amount'], fill_price
+
+# Function to time calls to the named functions of a module; returns the stats dict it fills
+def instrument(module, names):
+    stats = {}
+    for name in names:
+        original = getattr(module, name, None)
+        if original is None:
+            continue
+        stats[name] = [0, 0.0]
+
+        def timed(*args, _original=original, _name=name, **kwargs):
+            started = time.perf_counter()
+            try:
+                return _original(*args, **kwargs)
+            finally:
+                stats[_name][0] += 1
+                stats[_name][1] += time.perf_counter() - started
+        setattr(module, name, timed)
+    return stats
+
+# Function to point a module, and every module-level object built with an exchange (order
+# tracker, trailing stops, ...), at the simulated exchange
+def swap_exchange(module, exchange):
+    if hasattr(module, 'exchange'):
+        module.exchange = exchange
+    for value in list(vars(module).values()):
+        if not isinstance(value, (type, types.ModuleType)) and 'exchange' in getattr(value, '__dict__', {}):
+            value.exchange = exchange
+
+# Function to fail the replay if any patched module can still reach a live ccxt exchange
+def assert_offline(modules):
+    ccxt = sys.modules.get('ccxt')
+    if ccxt is None:
+        return
+    for module in modules:
+        for name, value in vars(module).items():
+            for candidate, path in ((value, name), (getattr(value, '__dict__', {}).get('exchange'), f"{name}.exchange")):
+                if isinstance(candidate, ccxt.Exchange):
+                    raise RuntimeError(f"Replay would reach a live exchange through {module.__name__}.{path}")
+
+# Function to import a bot module without letting it open the live trade journal
+def import_bot(bot_name):
+    os.environ['TBOT_JOURNAL_PATH'] = ':memory:'
+    return importlib.import_module(bot_name)
+
+# Function to run a bot module's trading_bot() against recorded candles
+def run_replay(bot_name, candles, base_timeframe, start_ms, end_ms, poll_step=1.0, balance=1000.0,
+               stages=('fetch_data', 'calculate_rsi', 'calculate_atr', 'moving_average_cross',
+                       'identify_range_break', 'calculate_position_size', 'place_order')):
+    bot = import_bot(bot_name)
+    clock = VirtualClock(start_ms, end_ms, poll_step)
+    exchange = ReplayExchange(candles, base_timeframe, clock, balance)
+    datetime_module, time_module = clock_modules(clock)
+    # Risk checks only read the day; ticking there would tie day rollover to the number of checks
+    reader_datetime, _ = clock_modules(clock, ticking=False)
+    # Patch every loaded project module that reads the clock or talks to the exchange
+    modules = [bot] + [sys.modules[name] for name in ('candle_buffer', 'order_tracker', 'risk_engine', 'TBOT_LENV') if name in sys.modules]
+    for module in modules:
+        swap_exchange(module, exchange)
+        if hasattr(module, 'time'):
+            module.time = time_module
+        if hasattr(module, 'datetime'):
+            module.datetime = reader_datetime if module.__name__ == 'risk_engine' else datetime_module
+    if hasattr(bot, 'journal'):
+        bot.journal = TradeJournal(':memory:')
+    if hasattr(bot, 'market_bus'):
+        bot.market_bus = None  # Live shared-memory feed, not recorded data
+    assert_offline(modules)
+    stats = instrument(bot, stages)
+    started = time.perf_counter()
+    try:
+        bot.trading_bot()
+    except ReplayFinished:
+        pass
+    wall = time.perf_counter() - started
+    replayed = (end_ms - start_ms) / 1000
+    logging.info(f"Replayed {replayed / 3600:.1f}h of market time in {wall:.2f}s ({replayed / max(wall, 1e-9):.0f}x), "
+                 f"{exchange.api_calls} simulated API calls")
+    for name, (count, total) in stats.items():
+        if count:
+            logging.info(f"  {name}: {count} calls, {total * 1000:.1f} ms total, {total / count * 1e6:.0f} us/call")
+    return {'exchange': exchange, 'stats': stats, 'wall_seconds': wall}
+
+def parse_date(value):
+    return int(datetime.datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=datetime.timezone.utc).timestamp() * 1000)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded candles through a bot's live trading loop.")
+    parser.add_argument('--bot', default='TBOT_LENV')
+    parser.add_argument('--db', default='ohlcv_history.db', help="Candle store written by backfill.py")
+    parser.add_argument('--base-timeframe', default='1m')
+    parser.add_argument('--start', required=True, help="UTC date YYYY-MM-DD")
+    parser.add_argument('--end', required=True, help="UTC date YYYY-MM-DD")
+    parser.add_argument('--warmup-days', type=int, default=3, help="History served before --start so indicators warm up")
+    parser.add_argument('--poll-step', type=float, default=1.0, help="Virtual seconds per clock poll")
+    parser.add_argument('--balance', type=float, default=1000.0)
+    args = parser.parse_args()
+    start_ms, end_ms = parse_date(args.start), parse_date(args.end)
+    bot = import_bot(args.bot)
+    symbol_list = getattr(bot, 'symbols', None) or [bot.symbol]
+    conn = open_store(args.db)
+    candles = {}
+    for symbol in symbol_list:
+        # Replay on validated candles, like the live fetch path
+        rows, flags, report = clean_ohlcv(load_candles(conn, symbol, args.base_timeframe, start_ms - args.warmup_days * 86400000, end_ms),
+                                          timeframe_to_ms(args.base_timeframe))
+        log_report(symbol, report)
+        candles[symbol] = [[int(row[0])] + row[1:] for row in rows.tolist()]
+    logging.getLogger().addHandler(logging.StreamHandler())
+    run_replay(args.bot, candles, args.base_timeframe, start_ms, end_ms, args.poll_step, args.balance)
@@ -0,0 +1,139 @@
+import math
+import logging
+import datetime
+
+# Pre-trade risk engine. Per-symbol limits and correlated-group membership are resolved once
+# up front, so validating an order intent is a handful of dict lookups and comparisons with
+# no exchange round-trips. Positions, exposure and daily PnL are updated incrementally from fills.
+
+default_limits = {
+    'max_notional': 1000.0,   # USDT per order
+    'max_leverage': 20,
+    'min_amount': 0.0,
+    'max_amount': math.inf,
+}
+
+class RiskEngine:
+    def __init__(self, balance=0.0, limits=None, symbol_limits=None, groups=None, max_group_exposure=None,
+                 max_account_leverage=3.0, daily_loss_cap=None, risk_fraction=0.01, clock=None):
+        self.balance = balance or 0.0
+        self.base_limits = {**default_limits, **(limits or {})}
+        self.symbol_overrides = symbol_limits or {}
+        self.limits = {}
+        # Symbol -> correlated group name; symbols outside any group form their own group
+        self.group_of = {symbol: group for group, members in (groups or {}).items() for symbol in members}
+        self.max_group_exposure = max_group_exposure
+        self.max_account_leverage = max_account_leverage
+        self.daily_loss_cap = daily_loss_cap
+        self.risk_fraction = risk_fraction
+        # Returns the current UTC datetime; the daily loss cap resets when its date changes
+        self.clock = clock
+        self.positions = {}       # symbol -> [signed quantity, average entry price]
+        self.exposure = {}        # symbol -> absolute entry notional
+        self.group_exposure = {}  # group -> absolute entry notional
+        self.total_exposure = 0.0
+        self.realized_pnl = 0.0
+        self.day = self._today()
+        for symbol in list(self.symbol_overrides) + list(self.group_of):
+            self.symbol_limits(symbol)
+
+    # Function to return the merged limits for a symbol, computed once and cached
+    def symbol_limits(self, symbol):
+        limits = self.limits.get(symbol)
+        if limits is None:
+            limits = {**self.base_limits, **self.symbol_overrides.get(symbol, {}), 'group': self.group_of.get(symbol, symbol)}
+            self.limits[symbol] = limits
+        return limits
+
+    # Function to change base limits at runtime; cached per-symbol limits are rebuilt on next use
+    def set_limits(self, **limits):
+        self.base_limits.update(limits)
+        self.limits.clear()
+
+    def set_balance(self, balance):
+        self.balance = balance or 0.0
+
+    def _today(self):
+        return (self.clock() if self.clock is not None else datetime.datetime.utcnow()).date()
+
+    def _roll_day(self):
+        today = self._today()
+        if today != self.day:
+            self.day = today
+            self.realized_pnl = 0.0
+
+    # Function to size a position: a fixed fraction of balance as notional, or, with stop_distance,
+    # the quantity that loses risk_fraction of balance at the stop. Always returns a quantity.
+    def position_size(self, symbol, price, stop_distance=None, leverage=1):
+        if not self.balance or self.balance <= 0 or not price or price <= 0:
+            return 0.0
+        limits = self.symbol_limits(symbol)
+        risk_amount = self.balance * self.risk_fraction
+        if stop_distance:
+            amount = risk_amount / stop_distance
+        else:
+            amount = risk_amount / price
+        max_notional = min(limits['max_notional'], self.balance * min(leverage, limits['max_leverage']))
+        return min(amount, max_notional / price, limits['max_amount'])
+
+    # Function to validate an order intent; returns (approved, reason)
+    def check(self, symbol, side, amount, price, leverage=1):
+        if not (amount > 0 and price > 0) or math.isinf(amount) or math.isinf(price):
+            return False, f"invalid amount {amount} or price {price}"
+        if self.balance <= 0:
+            return False, "no balance"
+        limits = self.symbol_limits(symbol)
+        self._roll_day()
+        if self.daily_loss_cap is not None and self.realized_pnl <= -self.daily_loss_cap:
+            return False, f"daily loss cap reached ({self.realized_pnl:.2f})"
+        if leverage > limits['max_leverage']:
+            return False, f"leverage {leverage} above cap {limits['max_leverage']}"
+        if amount < limits['min_amount'] or amount > limits['max_amount']:
+            return False, f"amount {amount} outside [{limits['min_amount']}, {limits['max_amount']}]"
+        notional = amount * price
+        if notional > limits['max_notional']:
+            return False, f"notional {notional:.2f} above {limits['max_notional']}"
+        quantity = self.positions.get(symbol, (0.0, 0.0))[0]
+        signed = amount if side == 'buy' else -amount
+        if abs(quantity + signed) < abs(quantity):
+            return True, "reduces position"
+        if self.total_exposure + notional > self.balance * self.max_account_leverage:
+            return False, f"account exposure would exceed {self.max_account_leverage}x balance"
+        if self.max_group_exposure is not None:
+            group = limits['group']
+            if self.group_exposure.get(group, 0.0) + notional > self.max_group_exposure:
+                return False, f"exposure of correlated group {group} would exceed {self.max_group_exposure}"
+        return True, "ok"
+
+    # Function to update positions, exposure and realized PnL from a fill
+    def on_fill(self, symbol, side, amount, price, fee=0.0):
+        self._roll_day()
+        quantity, average = self.positions.get(symbol, (0.0, 0.0))
+        signed = amount if side == 'buy' else -amount
+        if quantity == 0 or (quantity > 0) == (signed > 0):
+            new_quantity = quantity + signed
+            average = (abs(quantity) * average + amount * price) / abs(new_quantity)
+        else:
+            closed = min(abs(signed), abs(quantity))
+            self.realized_pnl += closed * (price - average) * (1 if quantity > 0 else -1)
+            new_quantity = quantity + signed
+            if new_quantity != 0 and (new_quantity > 0) != (quantity > 0):
+                average = price  # Position flipped; the remainder opened at this fill
+        self.realized_pnl -= fee
+        if abs(new_quantity) < 1e-12:
+            self.positions.pop(symbol, None)
+            new_quantity, average = 0.0, 0.0
+        else:
+            self.positions[symbol] = [new_quantity, average]
+        new_exposure = abs(new_quantity) * average
+        change = new_exposure - self.exposure.get(symbol, 0.0)
+        self.exposure[symbol] = new_exposure
+        group = self.symbol_limits(symbol)['group']
+        self.group_exposure[group] = self.group_exposure.get(group, 0.0) + change
+        self.total_exposure += change
+        logging.info(f"Risk: {symbol} position {new_quantity} @ {average}, realized PnL today {self.realized_pnl:.2f}")
+
+    # Function to compute unrealized PnL for a symbol at a mark price
+    def unrealized_pnl(self, symbol, price):
+        quantity, average = self.positions.get(symbol, (0.0, 0.0))
+        return quantity * (price - average)
@@ -0,0 +1,245 @@
+import os
+import copy
+import json
+import time
+import heapq
+import logging
+import argparse
+import threading
+import socketserver
+import numpy as np
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor
+
+import ccxt
+
+from candle_buffer import CandleRingBuffer, fetch_into
+from fast_ohlcv import FastKlineClient, fetch_into_fast
+from exchange_adapter import RateBudget, create_shared_session
+import signal_kernels as kernels
+from strategy_config import read_config_file
+
+# Live scanner over a large symbol universe. A background thread keeps a candle ring buffer
+# per symbol topped up incrementally and rescores a symbol only when its candles changed.
+# Queries are answered from the in-memory scores and never reach the exchange:
+#   GET /top?k=10[&side=buy|sell]   ranked opportunities
+#   GET /symbol?name=BTC/USDT       latest score for one symbol
+#   GET /health                     universe size and refresh timing
+# The API listens on TCP (127.0.0.1 by default) or, with --unix-socket, on a Unix socket.
+
+default_weights = {'rsi': 1.0, 'breakout': 1.0, 'ma_spread': 0.5}
+
+# Function to score one symbol from the tail of its buffer. Each component is signed
+# (positive favours a buy): RSI distance from 50 scaled to [-1, 1], close beyond the prior
+# range high/low in ATRs, and short-minus-long MA spread in ATRs. The side with the larger
+# weighted sum of its favourable components wins.
+def score_buffer(buffer, rsi_period=14, atr_period=14, short_window=21, long_window=100, range_window=20, weights=default_weights):
+    close, high, low = buffer.view('close'), buffer.view('high'), buffer.view('low')
+    n = close.shape[0]
+    if n < max(long_window, range_window + 1, rsi_period + 1, atr_period + 1):
+        return None
+    # Same kernels as the bots, run over just enough of the tail for the last value
+    rsi = kernels.calculate_rsi(close[-(rsi_period + 1):], rsi_period)[-1]
+    if np.isnan(rsi):
+        rsi = 50.0  # No movement at all over the window
+    tail = atr_period + 1
+    atr = kernels.calculate_atr(high[-tail:], low[-tail:], close[-tail:], atr_period)[-1]
+    if not atr > 0:
+        return None
+    price = close[-1]
+    range_high, range_low = high[-(range_window + 1):-1].max(), low[-(range_window + 1):-1].min()
+    breakout = (price - range_high) / atr if price > range_high else (price - range_low) / atr if price < range_low else 0.0
+    ma_spread = (close[-short_window:].mean() - close[-long_window:].mean()) / atr
+    components = {'rsi': (50 - rsi) / 50, 'breakout': breakout, 'ma_spread': ma_spread}
+    buy = sum(weights[name] * max(value, 0.0) for name, value in components.items())
+    sell = sum(weights[name] * max(-value, 0.0) for name, value in components.items())
+    return {'side': 'buy' if buy >= sell else 'sell', 'score': round(max(buy, sell), 4), 'price': float(price),
+            'rsi': round(rsi, 2), 'atr': float(atr), 'breakout_atr': round(breakout, 3), 'ma_spread_atr': round(ma_spread, 3),
+            'candle_ts': int(buffer.view('timestamp')[-1])}
+
+# Function to pick the most liquid active spot markets in a quote currency (one tickers call)
+def top_symbols(exchange, quote='USDT', limit=200):
+    markets = exchange.load_markets()
+    candidates = [symbol for symbol, market in markets.items()
+                  if market.get('spot') and market.get('active', True) and market.get('quote') == quote]
+    tickers = exchange.fetch_tickers()
+    candidates.sort(key=lambda symbol: (tickers.get(symbol) or {}).get('quoteVolume') or 0, reverse=True)
+    return candidates[:limit]
+
+class Scanner:
+    def __init__(self, exchange, symbols, timeframe='15m', capacity=200, workers=4, rate=10, settings=None, weights=None):
+        self.exchange = exchange
+        self.symbols = list(symbols)
+        self.timeframe = timeframe
+        self.settings = {'rsi_period': 14, 'atr_period': 14, 'short_window': 21, 'long_window': 100, 'range_window': 20,
+                         **(settings or {})}
+        self.weights = {**default_weights, **(weights or {})}
+        self.buffers = {symbol: CandleRingBuffer(capacity) for symbol in self.symbols}
+        self.versions = {}
+        self.scores = {}
+        self.kline_client = FastKlineClient() if getattr(exchange, 'id', None) == 'mexc' else None
+        self.budget = RateBudget(rate, rate)
+        self.workers = workers
+        # ccxt instances are not thread-safe, so each pool thread gets its own sharing one HTTP session
+        self.session = create_shared_session(pool_maxsize=max(workers, 1))
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.sweeps = 0
+        self.last_sweep_seconds = None
+        self.stopped = threading.Event()
+        self.thread = None
+
+    # Function to return this thread's exchange: a private clone of a ccxt exchange, else the one given
+    def thread_exchange(self):
+        if not isinstance(self.exchange, ccxt.Exchange):
+            return self.exchange
+        exchange = getattr(self.local, 'exchange', None)
+        if exchange is None:
+            with self.lock:
+                if not self.exchange.markets:
+                    self.exchange.load_markets()
+            exchange = type(self.exchange)({'enableRateLimit': False, 'session': self.session})
+            exchange.urls = copy.deepcopy(self.exchange.urls)
+            exchange.set_markets(self.exchange.markets, self.exchange.currencies)
+            self.local.exchange = exchange
+        return exchange
+
+    # Function to top up one symbol and rescore it if its last candle changed
+    def refresh_symbol(self, symbol):
+        buffer = self.buffers[symbol]
+        self.budget.acquire()
+        try:
+            if self.kline_client is not None:
+                fetch_into_fast(buffer, self.kline_client, symbol, self.timeframe)
+            else:
+                fetch_into(buffer, self.thread_exchange(), symbol, self.timeframe)
+        except Exception as e:
+            logging.warning(f"Scanner fetch failed for {symbol}: {e}")
+            return
+        if not len(buffer):
+            return
+        version = (buffer.written, buffer.view('close')[-1])
+        if self.versions.get(symbol) == version:
+            return
+        self.versions[symbol] = version
+        score = score_buffer(buffer, weights=self.weights, **self.settings)
+        if score is None:
+            self.scores.pop(symbol, None)
+        else:
+            score['updated'] = time.time()
+            self.scores[symbol] = score
+
+    def sweep(self):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            list(pool.map(self.refresh_symbol, self.symbols))
+        self.sweeps += 1
+        self.last_sweep_seconds = time.perf_counter() - started
+        logging.info(f"Scanner sweep {self.sweeps}: {len(self.scores)}/{len(self.symbols)} scored in {self.last_sweep_seconds:.1f}s")
+
+    def run(self, interval=30):
+        while not self.stopped.is_set():
+            started = time.monotonic()
+            try:
+                self.sweep()
+            except Exception as e:
+                logging.error(f"Scanner sweep failed: {e}")
+            self.stopped.wait(max(0.0, interval - (time.monotonic() - started)))
+
+    def start(self, interval=30):
+        self.thread = threading.Thread(target=self.run, args=(interval,), name='scanner', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+
+    # Function to return the k best-scoring symbols, optionally for one side only
+    def top(self, k=10, side=None):
+        entries = [{'symbol': symbol, **score} for symbol, score in list(self.scores.items())
+                   if side is None or score['side'] == side]
+        return heapq.nlargest(k, entries, key=lambda entry: entry['score'])
+
+    def health(self):
+        return {'symbols': len(self.symbols), 'scored': len(self.scores), 'sweeps': self.sweeps,
+                'last_sweep_seconds': self.last_sweep_seconds, 'timeframe': self.timeframe}
+
+# Function to build a request handler class answering from a scanner's in-memory state
+def make_handler(scanner):
+    class ScannerHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            try:
+                if url.path == '/top':
+                    side = query.get('side', [None])[0]
+                    if side not in (None, 'buy', 'sell'):
+                        raise ValueError("side must be buy or sell")
+                    self.reply(200, {'results': scanner.top(int(query.get('k', ['10'])[0]), side)})
+                elif url.path == '/symbol':
+                    name = query.get('name', [''])[0]
+                    score = scanner.scores.get(name)
+                    self.reply(200 if score else 404, {'symbol': name, **score} if score else {'error': f"no score for {name}"})
+                elif url.path == '/health':
+                    self.reply(200, scanner.health())
+                else:
+                    self.reply(404, {'error': 'not found'})
+            except ValueError as e:
+                self.reply(400, {'error': str(e)})
+
+        def reply(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        # Unix socket peers have no address
+        def address_string(self):
+            return self.client_address[0] if self.client_address else 'unix'
+
+        def log_message(self, format, *args):
+            logging.debug(f"Scanner API {self.address_string()}: {format % args}")
+
+    return ScannerHandler
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+# Function to create the API server on a Unix socket path or a TCP host/port
+def make_server(scanner, host='127.0.0.1', port=8765, unix_socket=None):
+    handler = make_handler(scanner)
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        return ThreadingUnixHTTPServer(unix_socket, handler)
+    return ThreadingHTTPServer((host, port), handler)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve ranked live signals across a symbol universe.")
+    parser.add_argument('--strategy', default='strategy.toml', help="Watchlist and indicator settings")
+    parser.add_argument('--universe', type=int, default=0, help="Scan the N most liquid USDT pairs instead of the watchlist")
+    parser.add_argument('--interval', type=float, default=30, help="Seconds between refresh sweeps")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix-socket', help="Listen on this Unix socket path instead of TCP")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    config = read_config_file(args.strategy)
+    exchange = ccxt.mexc({'enableRateLimit': True})
+    symbols = top_symbols(exchange, limit=args.universe) if args.universe else config['symbols']
+    scanner = Scanner(exchange, symbols, config.get('timeframe', '15m'), workers=args.workers, settings={
+        'rsi_period': config.get('lookback_period', 14),
+        'short_window': config.get('short_ma_period', 21),
+        'long_window': config.get('long_ma_period', 100),
+    })
+    scanner.start(args.interval)
+    server = make_server(scanner, args.host, args.port, args.unix_socket)
+    logging.info(f"Scanner API listening on {args.unix_socket or f'{args.host}:{args.port}'} for {len(symbols)} symbols")
+    try:
+        server.serve_forever()
+    finally:
+        scanner.stop()
+        server.server_close()
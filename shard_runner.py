@@ -0,0 +1,336 @@
+import os
+import time
+import queue
+import logging
+import argparse
+import multiprocessing as mp
+
+from exchange_adapter import ExchangeAdapter
+from candle_buffer import CandleRingBuffer, ClosedCandles, fetch_into
+from trade_journal import TradeJournal, JournalWriteError, reconcile
+from order_tracker import OrderTracker
+from risk_engine import RiskEngine
+from correlation_filter import RollingCorrelation, CorrelationFilter
+from signal_kernels import calculate_rsi, calculate_atr, ma_cross_signals, range_break_signals
+
+# Coordinator/worker mode: the symbol list is sharded across worker processes that each own
+# their exchange connection and indicator work, and report signals over a local queue to one
+# risk/execution process that enforces global limits such as max concurrent positions.
+
+symbols = [
+    'BTC/USDT', 'ETH/USDT', 'SOL/USDT', 'BNB/USDT', 'LINK/USDT',
+    'XRP/USDT', 'DOGE/USDT', 'AVAX/USDT', 'DOT/USDT', 'ADA/USDT',
+    'TON/USDT', 'RAY/USDT'
+]
+timeframe = '15m'
+lookback_period = 14
+rsi_overbought, rsi_oversold = 75, 25
+short_ma_period, long_ma_period = 21, 100
+leverage, balance_cache_duration = 20, 180
+cycle_seconds = 60
+entry_order_ttl = 15 * 60  # Cancel entries still resting after one candle
+# ccxt surface the coordinator needs: reconcile(), OrderTracker and order placement.
+# The optional calls are only used when the exchange advertises them in `has`.
+coordinator_exchange_calls = ('has', 'fetch_balance', 'create_order', 'cancel_order', 'fetch_order', 'fetch_open_orders')
+coordinator_optional_calls = {'fetchClosedOrders': 'fetch_closed_orders', 'fetchPositions': 'fetch_positions'}
+
+# Function to split the symbol list into n round-robin shards
+def shard_symbols(symbol_list, n):
+    return [symbol_list[i::n] for i in range(n) if symbol_list[i::n]]
+
+# Function to evaluate the TBOT_LENV entry conditions on one symbol's closed candles
+def evaluate_symbol(candles):
+    closed = ClosedCandles(candles)
+    high, low, close = closed.view('high'), closed.view('low'), closed.view('close')
+    price = candles.view('close')[-1]  # Live price of the forming candle, only used to price the order
+    current_rsi = calculate_rsi(close, lookback_period)[-1]
+    atr_value = calculate_atr(high, low, close)[-1]
+    if closed.signal_bar_issues():
+        return None, price, atr_value, current_rsi
+    ma_cross = ma_cross_signals(close, short_ma_period, long_ma_period)[-1]
+    range_break = range_break_signals(high, low, close)[-1]
+    if (range_break == 1 or ma_cross == 1) and current_rsi < rsi_oversold:
+        return 'buy', price, atr_value, current_rsi
+    if (range_break == -1 or ma_cross == -1) and current_rsi > rsi_overbought:
+        return 'sell', price, atr_value, current_rsi
+    return None, price, atr_value, current_rsi
+
+def worker_main(worker_id, shard, signal_queue, stop_event):
+    logging.basicConfig(level=logging.INFO, format=f'%(asctime)s - worker {worker_id} - %(levelname)s - %(message)s')
+    exchange = ExchangeAdapter('mexc')
+    candle_buffers = {symbol: CandleRingBuffer(200) for symbol in shard}
+    reported_bars = {}
+    logging.info(f"Worker {worker_id} scanning {len(shard)} symbols: {shard}")
+    while not stop_event.is_set():
+        cycle_start = time.time()
+        for symbol in shard:
+            try:
+                candles = fetch_into(candle_buffers[symbol], exchange, symbol, timeframe)
+            except Exception as e:
+                logging.error(f"Error fetching {symbol} data: {e}")
+                continue
+            if len(candles) >= 2 and reported_bars.get(symbol) != candles.view('timestamp')[-2]:
+                # Report each newly closed candle so the coordinator can track correlations
+                reported_bars[symbol] = candles.view('timestamp')[-2]
+                signal_queue.put({'bar': symbol, 'ts': int(candles.view('timestamp')[-2]), 'close': float(candles.view('close')[-2])})
+            if len(candles) < long_ma_period:
+                logging.warning(f"Insufficient data for {symbol}. Waiting for more data points.")
+                continue
+            side, price, atr_value, current_rsi = evaluate_symbol(candles)
+            if side is not None:
+                signal_queue.put({'symbol': symbol, 'side': side, 'price': float(price), 'atr': float(atr_value),
+                                  'rsi': float(current_rsi), 'ts': time.time(), 'worker': worker_id})
+        signal_queue.put({'heartbeat': worker_id, 'cycle_time': time.time() - cycle_start, 'ts': time.time()})
+        stop_event.wait(max(0, cycle_seconds - (time.time() - cycle_start)))
+
+# Function to fail fast when the coordinator is handed an exchange without the calls it depends on
+def check_exchange(exchange):
+    missing = [name for name in coordinator_exchange_calls if not hasattr(exchange, name)]
+    if not missing:
+        missing = [name for flag, name in coordinator_optional_calls.items() if exchange.has.get(flag) and not hasattr(exchange, name)]
+    if missing:
+        raise TypeError(f"{type(exchange).__name__} cannot drive the coordinator; missing {missing}")
+
+# Single risk/execution process: every order goes through here, so global limits hold
+class Coordinator:
+    def __init__(self, exchange, journal, symbol_list, max_positions=1, correlation_threshold=0.8):
+        check_exchange(exchange)
+        self.exchange = exchange
+        self.journal = journal
+        self.max_positions = max_positions
+        self.correlation = RollingCorrelation(symbol_list, window=96)
+        self.correlation_filter = CorrelationFilter(self.correlation, threshold=correlation_threshold)
+        # Closed-candle closes per timestamp; a row waits for up to two newer timestamps for late workers
+        self.pending_bars = {}
+        self.last_bar_ts = None
+        self.risk = RiskEngine(limits={'max_leverage': leverage}, risk_fraction=0.01)
+        self.order_tracker = OrderTracker(exchange, self.on_order_event, default_ttl=entry_order_ttl)
+        self.last_order_poll = 0.0
+        self.unprotected = {}  # symbol -> place_protective_order() arguments still to retry
+        # A symbol holds a slot from entry until its trade is journaled as closed
+        self.open_positions = set()
+        self.cached_balance = None
+        self.last_balance_fetch_time = None
+        self.recover_state()
+
+    # Function to restore journaled trades, re-track their orders and re-protect filled positions
+    def recover_state(self):
+        state = reconcile(self.exchange, self.journal)
+        if state['cached_balance'] is not None:
+            self.cached_balance = state['cached_balance']
+            self.last_balance_fetch_time = state['last_balance_fetch_time']
+        self.open_positions.update(state['trades'])
+        for trade in state['trades'].values():
+            if trade['protect_order_id'] is not None:
+                self.risk.on_fill(trade['symbol'], trade['side'], trade['amount'], trade['entry_price'])
+                self.order_tracker.track(trade['protect_order_id'], trade['symbol'], 'sell' if trade['side'] == 'buy' else 'buy',
+                                         trade['amount'], kind='protect', entry_side=trade['side'],
+                                         stop_loss_price=trade['stop_loss_price'], take_profit_price=trade['take_profit_price'])
+        for trade in state['unprotected']:
+            if trade['status'] in ('intent', 'open'):
+                self.order_tracker.track(trade['entry_order_id'], trade['symbol'], trade['side'], trade['amount'], kind='entry',
+                                         placed_at=trade['intent_ts'], entry_price=trade['entry_price'],
+                                         stop_loss_price=trade['stop_loss_price'], take_profit_price=trade['take_profit_price'])
+                continue
+            self.risk.on_fill(trade['symbol'], trade['side'], trade['amount'], trade['entry_price'])
+            logging.warning(f"Position on {trade['symbol']} has no protective order. Placing it now.")
+            self.protect_position(trade['symbol'], trade['side'], trade['amount'],
+                                  trade['stop_loss_price'], trade['take_profit_price'])
+
+    def place_protective_order(self, symbol, side, amount, stop_loss_price, take_profit_price):
+        exit_side = 'sell' if side == 'buy' else 'buy'
+        self.journal.record('protect_intent', symbol, sync=True, side=exit_side, amount=amount,
+                            stop_loss_price=stop_loss_price, take_profit_price=take_profit_price)
+        protect = self.exchange.create_order(symbol, 'limit', exit_side, amount, take_profit_price, {'stopPrice': stop_loss_price})
+        self.journal.record('protect_ack', symbol, order_id=protect['id'])
+        self.order_tracker.track(protect['id'], symbol, exit_side, amount, kind='protect', entry_side=side,
+                                 stop_loss_price=stop_loss_price, take_profit_price=take_profit_price)
+        return protect
+
+    # Function to protect a position, queueing it for another attempt next poll if the order fails
+    def protect_position(self, symbol, side, amount, stop_loss_price, take_profit_price):
+        self.unprotected.pop(symbol, None)
+        try:
+            return self.place_protective_order(symbol, side, amount, stop_loss_price, take_profit_price)
+        except Exception as e:
+            logging.error(f"Failed to place protective order for {symbol}, retrying next poll: {e}")
+            self.unprotected[symbol] = (symbol, side, amount, stop_loss_price, take_profit_price)
+
+    # Function to close the trade on a symbol and free its position slot
+    def close_trade(self, symbol, reason):
+        self.journal.record('closed', symbol, reason=reason)
+        self.open_positions.discard(symbol)
+
+    # Function to react to order tracker events: risk and protection on real fills, slot release on close
+    def on_order_event(self, event, tracked, order):
+        symbol, filled = tracked['symbol'], order.get('filled') or 0.0
+        price = order.get('average') or order.get('price') or tracked.get('entry_price')
+        if event == 'partial':
+            logging.info(f"{tracked['kind'].capitalize()} order on {symbol} partly filled: {filled}/{tracked['amount']}")
+            return
+        if tracked['kind'] == 'entry':
+            if event != 'filled' and not filled:
+                logging.info(f"Entry on {symbol} {event} without a fill.")
+                self.close_trade(symbol, f"entry {event} without fill")
+                return
+            filled = filled or tracked['amount']
+            self.journal.record('fill', symbol, order_id=tracked['id'], amount=filled, price=price)
+            self.risk.on_fill(symbol, tracked['side'], filled, price)
+            self.protect_position(symbol, tracked['side'], filled, tracked['stop_loss_price'], tracked['take_profit_price'])
+        elif event == 'filled':
+            logging.info(f"Protective order on {symbol} executed at {price}. Trade closed.")
+            self.risk.on_fill(symbol, tracked['side'], filled or tracked['amount'], price)
+            self.close_trade(symbol, 'protective order executed')
+        else:
+            # Canceled or rejected outside the bot while the position is still open: protect what is left
+            if filled:
+                self.risk.on_fill(symbol, tracked['side'], filled, price)
+            remaining = tracked['amount'] - filled
+            if remaining <= tracked['amount'] * 1e-9:
+                self.close_trade(symbol, f"protective order {event} after filling")
+                return
+            logging.warning(f"Protective order on {symbol} was {event}; re-placing it for {remaining}.")
+            self.protect_position(symbol, tracked['entry_side'], remaining, tracked['stop_loss_price'], tracked['take_profit_price'])
+
+    # Function to refresh tracked orders at most once per cycle
+    def poll_orders(self):
+        if time.time() - self.last_order_poll >= cycle_seconds:
+            self.last_order_poll = time.time()
+            self.order_tracker.poll()
+            for args in list(self.unprotected.values()):
+                self.protect_position(*args)
+
+    def position_size(self, symbol, price):
+        current_time = time.time()
+        if self.cached_balance is None or (current_time - self.last_balance_fetch_time) > balance_cache_duration:
+            try:
+                self.cached_balance = self.exchange.fetch_balance()['total']['USDT']
+                self.last_balance_fetch_time = current_time
+                self.journal.record('balance', balance=self.cached_balance)
+            except Exception as e:
+                logging.error(f"Error fetching balance: {e}")
+                return 0
+        self.risk.set_balance(self.cached_balance)
+        return self.risk.position_size(symbol, price, leverage=leverage)
+
+    # Function to collect closed candles from all workers. A row goes into the correlations once every
+    # symbol reported it, or once two newer timestamps exist, so a slow worker's bar is not lost.
+    def handle_bar(self, message):
+        ts = message['ts']
+        if self.last_bar_ts is not None and ts <= self.last_bar_ts:
+            logging.debug(f"Dropping {message['bar']} bar at {ts}: row already applied.")
+            return
+        self.pending_bars.setdefault(ts, {})[message['bar']] = message['close']
+        symbols = self.correlation.symbols
+        while self.pending_bars:
+            oldest = min(self.pending_bars)
+            closes = self.pending_bars[oldest]
+            if len(closes) < len(symbols) and len(self.pending_bars) < 3:
+                break
+            del self.pending_bars[oldest]
+            self.correlation.update_closes([closes.get(symbol, float('nan')) for symbol in symbols])
+            self.last_bar_ts = oldest
+
+    # Function to apply global limits to a worker signal and place the bracket orders
+    def handle_signal(self, signal):
+        symbol, side, price = signal['symbol'], signal['side'], signal['price']
+        if time.time() - signal['ts'] > cycle_seconds:
+            logging.info(f"Dropping stale {side} signal for {symbol}.")
+            return
+        if symbol in self.open_positions:
+            return
+        if len(self.open_positions) >= self.max_positions:
+            logging.info(f"Max concurrent positions ({self.max_positions}) reached. Skipping {side} on {symbol}.")
+            return
+        open_sides = {held: 'buy' if quantity > 0 else 'sell' for held, (quantity, _) in self.risk.positions.items()}
+        # Entries placed but not yet filled are about to become positions, so they count too
+        for tracked in self.order_tracker.orders.values():
+            if tracked['kind'] == 'entry':
+                open_sides.setdefault(tracked['symbol'], tracked['side'])
+        weight = self.correlation_filter.weight(symbol, side, open_sides)
+        if weight <= 0:
+            logging.info(f"Suppressing {side} on {symbol}: correlated position already open.")
+            return
+        amount = self.position_size(symbol, price) * weight
+        approved, reason = self.risk.check(symbol, side, amount, price, leverage)
+        if not approved:
+            logging.warning(f"Risk check rejected {side} {amount} {symbol} at {price}: {reason}")
+            return
+        stop_distance, take_profit_distance = signal['atr'] * 0.5, signal['atr'] * 1.5
+        if side == 'buy':
+            stop_loss_price, take_profit_price = price - stop_distance, price + take_profit_distance
+        else:
+            stop_loss_price, take_profit_price = price + stop_distance, price - take_profit_distance
+        try:
+            # The intent must be on disk before the exchange can know about the order
+            self.journal.record('entry_intent', symbol, sync=True, side=side, amount=amount, entry_price=price,
+                                stop_loss_price=stop_loss_price, take_profit_price=take_profit_price)
+        except JournalWriteError as e:
+            logging.error(f"Not placing {side} on {symbol}: {e}")
+            return
+        try:
+            order = self.exchange.create_order(symbol, 'limit', side, amount, price, {'leverage': leverage})
+        except Exception as e:
+            self.journal.record('entry_failed', symbol, reason=str(e))
+            logging.error(f"{side.capitalize()} order placement on {symbol} failed: {e}")
+            return
+        self.journal.record('entry_ack', symbol, order_id=order['id'])
+        self.open_positions.add(symbol)
+        # Risk exposure and protection follow the entry's actual fill (see on_order_event)
+        self.order_tracker.track(order['id'], symbol, side, amount, kind='entry', entry_price=price,
+                                 stop_loss_price=stop_loss_price, take_profit_price=take_profit_price)
+        logging.info(f"{side.capitalize()} order placed on {symbol} from worker {signal['worker']} with Stop Loss at {stop_loss_price} and Take Profit at {take_profit_price}")
+
+def run(symbol_list, workers, max_positions):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - coordinator - %(levelname)s - %(message)s')
+    shards = shard_symbols(symbol_list, workers)
+    signal_queue = mp.Queue()
+    stop_event = mp.Event()
+    processes = [mp.Process(target=worker_main, args=(i, shard, signal_queue, stop_event), daemon=True)
+                 for i, shard in enumerate(shards)]
+    for process in processes:
+        process.start()
+    coordinator = Coordinator(ExchangeAdapter('mexc'), TradeJournal(os.getenv('TBOT_JOURNAL_PATH', 'trade_journal.db')),
+                              symbol_list, max_positions)
+    logging.info(f"Started {len(processes)} workers for {len(symbol_list)} symbols (max {max_positions} positions).")
+    try:
+        while True:
+            coordinator.poll_orders()
+            try:
+                message = signal_queue.get(timeout=1)
+            except queue.Empty:
+                for i, process in enumerate(processes):
+                    if not process.is_alive():
+                        logging.error(f"Worker {i} exited with code {process.exitcode}. Restarting it.")
+                        processes[i] = mp.Process(target=worker_main, args=(i, shards[i], signal_queue, stop_event), daemon=True)
+                        processes[i].start()
+                continue
+            if 'bar' in message:
+                coordinator.handle_bar(message)
+                continue
+            if 'heartbeat' in message:
+                logging.info(f"Worker {message['heartbeat']} finished a cycle in {message['cycle_time']:.2f}s")
+                continue
+            coordinator.handle_signal(message)
+    except KeyboardInterrupt:
+        logging.info("Stopping workers...")
+    finally:
+        stop_event.set()
+        for process in processes:
+            process.join(timeout=5)
+        coordinator.journal.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scan the symbol universe with N worker processes and one execution process.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--max-positions', type=int, default=1)
+    parser.add_argument('--symbols', nargs='+', default=symbols)
+    parser.add_argument('--check', action='store_true', help="Start the coordinator against an empty in-memory journal and exit")
+    args = parser.parse_args()
+    if args.check:
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - coordinator - %(levelname)s - %(message)s')
+        coordinator = Coordinator(ExchangeAdapter('mexc'), TradeJournal(':memory:'), args.symbols, args.max_positions)
+        coordinator.journal.close()
+        logging.info("Coordinator startup check passed.")
+    else:
+        run(args.symbols, args.workers, args.max_positions)
@@ -0,0 +1,324 @@
+import time
+import logging
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Array kernels for the indicators and signals used by the bots, for bar-by-bar backtests and
+# per-tick evaluation. Loop kernels are compiled with Numba when it is installed; otherwise
+# pure-NumPy equivalents are used. Every function returns one value per bar, where bar i only
+# sees data up to i, so signals[-1] matches what the pandas version returns on the same window.
+
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+fibonacci_levels = [0.236, 0.382, 0.5, 0.618, 0.786]
+
+def _rolling_mean_loop(x, window):
+    n = x.shape[0]
+    out = np.full(n, np.nan)
+    total, compensation, nans = 0.0, 0.0, 0
+    for i in range(n):
+        value = x[i]
+        if value != value:
+            nans += 1
+        else:
+            # Kahan summation keeps long running sums as accurate as pandas' rolling mean
+            y = value - compensation
+            t = total + y
+            compensation = (t - total) - y
+            total = t
+        if i >= window:
+            old = x[i - window]
+            if old != old:
+                nans -= 1
+            else:
+                y = -old - compensation
+                t = total + y
+                compensation = (t - total) - y
+                total = t
+        if i >= window - 1 and nans == 0:
+            out[i] = total / window
+    return out
+
+def _rolling_max_loop(x, window):
+    # Monotonic deque of indices, O(n) regardless of window size
+    n = x.shape[0]
+    out = np.full(n, np.nan)
+    queue = np.empty(n, np.int64)
+    head, tail, last_nan = 0, 0, -1
+    for i in range(n):
+        value = x[i]
+        if value != value:
+            last_nan = i
+        else:
+            while tail > head and x[queue[tail - 1]] <= value:
+                tail -= 1
+            queue[tail] = i
+            tail += 1
+        while tail > head and queue[head] <= i - window:
+            head += 1
+        if i >= window - 1 and last_nan <= i - window and tail > head:
+            out[i] = x[queue[head]]
+    return out
+
+def _simulate_exits_loop(side, high, low, close, stop_pct, take_profit_pct):
+    n = close.shape[0]
+    entry_idx = np.empty(n, np.int64)
+    exit_idx = np.empty(n, np.int64)
+    trade_side = np.empty(n, np.int64)
+    entry_price = np.empty(n)
+    exit_price = np.empty(n)
+    count = 0
+    i = 0
+    while i < n:
+        if side[i] == 0:
+            i += 1
+            continue
+        price = close[i]
+        direction = 1 if side[i] > 0 else -1
+        stop = price * (1 - direction * stop_pct)
+        target = price * (1 + direction * take_profit_pct)
+        j = i + 1
+        exit_at, exit_px = n - 1, close[n - 1]
+        while j < n:
+            # Stop is checked first: with only OHLC we cannot tell which level traded first
+            if direction == 1 and low[j] <= stop:
+                exit_at, exit_px = j, stop
+                break
+            if direction == -1 and high[j] >= stop:
+                exit_at, exit_px = j, stop
+                break
+            if direction == 1 and high[j] >= target:
+                exit_at, exit_px = j, target
+                break
+            if direction == -1 and low[j] <= target:
+                exit_at, exit_px = j, target
+                break
+            j += 1
+        entry_idx[count] = i
+        exit_idx[count] = exit_at
+        trade_side[count] = direction
+        entry_price[count] = price
+        exit_price[count] = exit_px
+        count += 1
+        i = exit_at + 1
+    return entry_idx[:count], exit_idx[:count], trade_side[:count], entry_price[:count], exit_price[:count]
+
+def _rolling_mean_numpy(x, window):
+    out = np.full(x.shape[0], np.nan)
+    if x.shape[0] < window:
+        return out
+    valid = ~np.isnan(x)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(valid, x, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(valid)))
+    window_sums = sums[window:] - sums[:-window]
+    full = (counts[window:] - counts[:-window]) == window
+    out[window - 1:] = np.where(full, window_sums / window, np.nan)
+    return out
+
+def _rolling_max_numpy(x, window):
+    out = np.full(x.shape[0], np.nan)
+    if x.shape[0] < window:
+        return out
+    # np.max propagates NaN, matching pandas' requirement of a full window
+    out[window - 1:] = sliding_window_view(x, window).max(axis=1)
+    return out
+
+if HAVE_NUMBA:
+    _rolling_mean_kernel = njit(cache=True)(_rolling_mean_loop)
+    _rolling_max_kernel = njit(cache=True)(_rolling_max_loop)
+    _simulate_exits_kernel = njit(cache=True)(_simulate_exits_loop)
+else:
+    _rolling_mean_kernel = _rolling_mean_numpy
+    _rolling_max_kernel = _rolling_max_numpy
+    _simulate_exits_kernel = _simulate_exits_loop
+
+def _as_array(values):
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+# Function to compute a rolling mean (same as pandas rolling(window).mean())
+def rolling_mean(values, window):
+    return _rolling_mean_kernel(_as_array(values), window)
+
+# Function to compute a rolling maximum (same as pandas rolling(window).max())
+def rolling_max(values, window):
+    return _rolling_max_kernel(_as_array(values), window)
+
+# Function to compute a rolling minimum (same as pandas rolling(window).min())
+def rolling_min(values, window):
+    return -_rolling_max_kernel(-_as_array(values), window)
+
+# Function to calculate RSI; first_delta_zero mirrors the delta.where(..., 0) variant of the older bots
+def calculate_rsi(close, period=14, first_delta_zero=False):
+    close = _as_array(close)
+    delta = np.empty_like(close)
+    delta[:1] = 0.0 if first_delta_zero else np.nan
+    delta[1:] = close[1:] - close[:-1]
+    gain = np.where(np.isnan(delta), delta, np.maximum(delta, 0.0))
+    loss = np.where(np.isnan(delta), delta, np.maximum(-delta, 0.0))
+    avg_gain = rolling_mean(gain, period)
+    avg_loss = rolling_mean(loss, period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = avg_gain / avg_loss
+        return 100 - (100 / (1 + rs))
+
+# Function to calculate ATR as a simple rolling mean of the true range
+def calculate_atr(high, low, close, period=14):
+    high, low, close = _as_array(high), _as_array(low), _as_array(close)
+    prev_close = np.concatenate(([np.nan], close[:-1]))
+    true_range = np.fmax(np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+    return rolling_mean(true_range, period)
+
+# Function to flag range breaks per bar: 1 breakout_up, -1 breakout_down, 0 none
+def range_break_signals(high, low, close, window=20):
+    close = _as_array(close)
+    signals = np.zeros(close.shape[0], np.int8)
+    high_max = rolling_max(high, window)
+    low_min = rolling_min(low, window)
+    up = close[1:] > high_max[:-1]
+    down = ~up & (close[1:] < low_min[:-1])
+    signals[1:][up] = 1
+    signals[1:][down] = -1
+    return signals
+
+# Function to flag moving average crosses per bar: 1 bullish, -1 bearish, 0 none.
+# With confirm_window set, a cross also needs the trend-push check used by Trading_BOT.py.
+def ma_cross_signals(close, short_window=21, long_window=100, high=None, low=None, confirm_window=None):
+    close = _as_array(close)
+    signals = np.zeros(close.shape[0], np.int8)
+    ma_short = rolling_mean(close, short_window)
+    ma_long = rolling_mean(close, long_window)
+    bullish = (ma_short[1:] > ma_long[1:]) & (ma_short[:-1] <= ma_long[:-1])
+    bearish = (ma_short[1:] < ma_long[1:]) & (ma_short[:-1] >= ma_long[:-1])
+    if confirm_window is not None:
+        recent_high = rolling_max(high, confirm_window)
+        recent_low = rolling_min(low, confirm_window)
+        bullish &= (close[1:] > ma_short[1:]) & (close[1:] > recent_high[:-1])
+        bearish &= (close[1:] < ma_short[1:]) & (close[1:] < recent_low[:-1])
+    signals[1:][bullish] = 1
+    signals[1:][bearish] = -1
+    return signals
+
+# Function to flag impulse waves per bar against Fibonacci levels of the trailing window:
+# 1 impulse_up, -1 impulse_down, 0 none (same precedence as identify_impulse_wave)
+def impulse_signals(high, low, close, window=100, levels=fibonacci_levels):
+    close = _as_array(close)
+    swing_high = rolling_max(high, window)
+    swing_low = rolling_min(low, window)
+    low_levels = [level for level in levels if level <= 0.382]
+    high_levels = [level for level in levels if level >= 0.618]
+    signals = np.zeros(close.shape[0], np.int8)
+    if low_levels:
+        down_level = swing_low + (swing_high - swing_low) * max(low_levels)
+        signals[close < down_level] = -1
+    if high_levels:
+        up_level = swing_low + (swing_high - swing_low) * min(high_levels)
+        signals[(signals == 0) & (close > up_level)] = 1
+    return signals
+
+# Function to simulate stop-loss/take-profit exits for per-bar entry signals, one position at a time.
+# Entries fill at the signal bar's close; returns a dict of per-trade arrays.
+def simulate_exits(side, high, low, close, stop_pct, take_profit_pct):
+    entry_idx, exit_idx, trade_side, entry_price, exit_price = _simulate_exits_kernel(
+        np.ascontiguousarray(side, dtype=np.int64), _as_array(high), _as_array(low), _as_array(close),
+        float(stop_pct), float(take_profit_pct),
+    )
+    returns = trade_side * (exit_price - entry_price) / entry_price
+    return {
+        'entry_idx': entry_idx, 'exit_idx': exit_idx, 'side': trade_side,
+        'entry_price': entry_price, 'exit_price': exit_price, 'return': returns,
+    }
+
+# Function to check every kernel against the pandas reference implementations from the bots
+def verify_against_pandas(n=5000, seed=0):
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    spread = np.abs(rng.normal(0, 0.005, n)) * close
+    data = pd.DataFrame({'high': close + spread, 'low': close - spread, 'close': close})
+    high, low = data['high'].to_numpy(), data['low'].to_numpy()
+
+    def check(name, ours, reference):
+        reference = np.asarray(reference, dtype=np.float64)
+        if not np.allclose(ours, reference, rtol=1e-9, atol=1e-9, equal_nan=True):
+            raise AssertionError(f"{name} differs from the pandas reference")
+        logging.info(f"{name}: matches pandas reference")
+
+    check('rolling_mean', rolling_mean(close, 21), data['close'].rolling(window=21).mean())
+    check('rolling_max', rolling_max(high, 20), data['high'].rolling(window=20).max())
+    check('rolling_min', rolling_min(low, 20), data['low'].rolling(window=20).min())
+
+    delta = data['close'].diff(1)
+    gain, loss = delta.clip(lower=0), -delta.clip(upper=0)
+    rs = gain.rolling(window=14).mean() / loss.rolling(window=14).mean()
+    check('calculate_rsi', calculate_rsi(close, 14), 100 - (100 / (1 + rs)))
+    gain, loss = delta.where(delta > 0, 0), -delta.where(delta < 0, 0)
+    rs = gain.rolling(window=14).mean() / loss.rolling(window=14).mean()
+    check('calculate_rsi(first_delta_zero)', calculate_rsi(close, 14, first_delta_zero=True), 100 - (100 / (1 + rs)))
+
+    high_close = np.abs(data['high'] - data['close'].shift())
+    low_close = np.abs(data['low'] - data['close'].shift())
+    tr = (data['high'] - data['low']).combine(high_close, max).combine(low_close, max)
+    check('calculate_atr', calculate_atr(high, low, close, 14), tr.rolling(window=14).mean())
+
+    # Signal equivalence: evaluate the pandas logic on every trailing window, as the live bots do
+    breaks = range_break_signals(high, low, close, 20)
+    crosses = ma_cross_signals(close, 21, 100)
+    confirmed = ma_cross_signals(close, 50, 200, high, low, confirm_window=5)
+    impulses = impulse_signals(high, low, close, 100)
+    high_max, low_min = data['high'].rolling(window=20).max(), data['low'].rolling(window=20).min()
+    ma_s, ma_l = data['close'].rolling(window=21).mean(), data['close'].rolling(window=100).mean()
+    ma_s50, ma_l200 = data['close'].rolling(window=50).mean(), data['close'].rolling(window=200).mean()
+    high5, low5 = data['high'].rolling(window=5).max(), data['low'].rolling(window=5).min()
+    for i in range(1, n):
+        expected = 1 if close[i] > high_max.iloc[i - 1] else (-1 if close[i] < low_min.iloc[i - 1] else 0)
+        if breaks[i] != expected:
+            raise AssertionError(f"range_break_signals differs at bar {i}")
+        if ma_s.iloc[i] > ma_l.iloc[i] and ma_s.iloc[i - 1] <= ma_l.iloc[i - 1]:
+            expected = 1
+        elif ma_s.iloc[i] < ma_l.iloc[i] and ma_s.iloc[i - 1] >= ma_l.iloc[i - 1]:
+            expected = -1
+        else:
+            expected = 0
+        if crosses[i] != expected:
+            raise AssertionError(f"ma_cross_signals differs at bar {i}")
+        expected = 0
+        if ma_s50.iloc[i] > ma_l200.iloc[i] and ma_s50.iloc[i - 1] <= ma_l200.iloc[i - 1]:
+            if close[i] > ma_s50.iloc[i] and close[i] > high5.iloc[i - 1]:
+                expected = 1
+        elif ma_s50.iloc[i] < ma_l200.iloc[i] and ma_s50.iloc[i - 1] >= ma_l200.iloc[i - 1]:
+            if close[i] < ma_s50.iloc[i] and close[i] < low5.iloc[i - 1]:
+                expected = -1
+        if confirmed[i] != expected:
+            raise AssertionError(f"ma_cross_signals(confirm_window) differs at bar {i}")
+        if i >= 99:
+            window = data.iloc[i - 99:i + 1]
+            max_price, min_price = window['high'].max(), window['low'].min()
+            expected = 0
+            for level in fibonacci_levels:
+                value = min_price + (max_price - min_price) * level
+                if close[i] > value and level >= 0.618:
+                    expected = 1
+                    break
+                elif close[i] < value and level <= 0.382:
+                    expected = -1
+                    break
+            if impulses[i] != expected:
+                raise AssertionError(f"impulse_signals differs at bar {i}")
+    logging.info("Signal kernels match the pandas reference on all bars")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logging.info(f"Numba available: {HAVE_NUMBA}")
+    verify_against_pandas()
+    rng = np.random.default_rng(1)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, 1_000_000)))
+    high, low = close * 1.001, close * 0.999
+    start = time.perf_counter()
+    side = range_break_signals(high, low, close, 20)
+    trades = simulate_exits(side, high, low, close, 0.01, 0.03)
+    logging.info(f"1M-bar backtest pass: {len(trades['return'])} trades in {time.perf_counter() - start:.3f}s")
@@ -0,0 +1,103 @@
+import os
+import logging
+import tomllib
+
+# Strategy and watchlist settings loaded from a TOML (or YAML, if PyYAML is installed) file,
+# validated against a schema and hot-reloaded when the file changes. A poll is a single
+# os.stat() call; the file is only parsed when its mtime or size changes, and an invalid
+# edit is logged and ignored so the running configuration stays in effect.
+
+supported_timeframes = {'1m', '5m', '15m', '30m', '1h', '4h', '1d'}
+candle_capacity = 200  # Candles kept per symbol; longer indicator periods would never warm up
+
+# key: (accepted types, check(value) -> error message or None)
+strategy_schema = {
+    'symbols': (list, lambda v: None if v and all(isinstance(s, str) and '/' in s for s in v) else "must be a non-empty list of 'BASE/QUOTE' symbols"),
+    'timeframe': (str, lambda v: None if v in supported_timeframes else f"must be one of {sorted(supported_timeframes)}"),
+    'lookback_period': (int, lambda v: None if v >= 2 else "must be at least 2"),
+    'rsi_overbought': ((int, float), lambda v: None if 0 < v < 100 else "must be between 0 and 100"),
+    'rsi_oversold': ((int, float), lambda v: None if 0 < v < 100 else "must be between 0 and 100"),
+    'short_ma_period': (int, lambda v: None if v >= 1 else "must be at least 1"),
+    'long_ma_period': (int, lambda v: None if 2 <= v <= candle_capacity else f"must be between 2 and {candle_capacity}"),
+    'leverage': (int, lambda v: None if 1 <= v <= 125 else "must be between 1 and 125"),
+    'balance_cache_duration': ((int, float), lambda v: None if v > 0 else "must be positive"),
+    'max_group_exposure': ((int, float), lambda v: None if v > 0 else "must be positive"),
+}
+
+# Function to check cross-field rules that a per-key schema cannot express
+def strategy_rules(config):
+    errors = []
+    if config.get('rsi_oversold', 0) >= config.get('rsi_overbought', 100):
+        errors.append("rsi_oversold must be below rsi_overbought")
+    if config.get('short_ma_period', 0) >= config.get('long_ma_period', 1 << 30):
+        errors.append("short_ma_period must be below long_ma_period")
+    return errors
+
+# Function to parse a strategy file by extension
+def read_config_file(path):
+    if path.endswith(('.yaml', '.yml')):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError("PyYAML is required for YAML strategy files; use TOML instead")
+        with open(path) as f:
+            try:
+                return yaml.safe_load(f) or {}
+            except yaml.YAMLError as e:
+                raise ValueError(f"invalid YAML: {e}")
+    with open(path, 'rb') as f:
+        return tomllib.load(f)
+
+# Function to validate a config dict; returns it with defaults applied or raises ValueError
+def validate_config(config, schema=strategy_schema, defaults=None, rules=strategy_rules):
+    if not isinstance(config, dict):
+        raise ValueError(f"expected a table of settings, got {type(config).__name__}")
+    merged = {**(defaults or {}), **config}
+    errors = [f"unknown setting '{key}'" for key in config if key not in schema]
+    for key, (types, check) in schema.items():
+        if key not in merged:
+            errors.append(f"missing setting '{key}'")
+            continue
+        value = merged[key]
+        if not isinstance(value, types) or isinstance(value, bool):
+            errors.append(f"'{key}' has the wrong type ({type(value).__name__})")
+            continue
+        problem = check(value)
+        if problem:
+            errors.append(f"'{key}' {problem}")
+    if not errors and rules is not None:
+        errors += rules(merged)
+    if errors:
+        raise ValueError("; ".join(errors))
+    return merged
+
+class ConfigWatcher:
+    def __init__(self, path, schema=strategy_schema, defaults=None, rules=strategy_rules):
+        self.path = path
+        self.schema = schema
+        self.defaults = defaults or {}
+        self.rules = rules
+        self.signature = None
+        self.config = validate_config({}, schema, self.defaults, rules) if self.defaults else None
+
+    # Function to reload the file if it changed; returns the set of changed keys (empty if nothing changed)
+    def poll(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return set()
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == self.signature:
+            return set()
+        self.signature = signature
+        try:
+            config = validate_config(read_config_file(self.path), self.schema, self.defaults, self.rules)
+        except (ValueError, TypeError, OSError) as e:
+            logging.error(f"Ignoring invalid strategy file {self.path}: {e}")
+            return set()
+        previous = self.config or {}
+        changed = {key for key in config if previous.get(key) != config[key]}
+        self.config = config
+        if changed:
+            logging.info(f"Strategy file {self.path} reloaded. Changed: {sorted(changed)}")
+        return changed
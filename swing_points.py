@@ -0,0 +1,129 @@
+import numpy as np
+
+from signal_kernels import HAVE_NUMBA, rolling_max, rolling_min, fibonacci_levels
+
+if HAVE_NUMBA:
+    from numba import njit
+
+# Swing-high/low (pivot + zig-zag) detection and Fibonacci retracements per swing leg.
+# A bar is a pivot high when its high is the highest of `left` bars before and `right` bars
+# after it, found with O(n) rolling extremes rather than a Python scan. Pivots are only known
+# `right` bars later, so every swing carries the bar index at which it was confirmed and the
+# per-bar helpers never look ahead, which makes them safe for one-pass backtests.
+
+def _zigzag_loop(is_high, is_low, high, low, min_change):
+    n = is_high.shape[0]
+    index = np.empty(n, np.int64)
+    kind = np.empty(n, np.int64)  # 1 swing high, -1 swing low
+    price = np.empty(n)
+    count = 0
+    for i in range(n):
+        # An outside bar can be both; take the side that continues the alternation first
+        first, second = 1, -1
+        if count > 0 and kind[count - 1] == 1:
+            first, second = -1, 1
+        for side in (first, second):
+            if side == 1 and not is_high[i]:
+                continue
+            if side == -1 and not is_low[i]:
+                continue
+            value = high[i] if side == 1 else low[i]
+            if count > 0 and kind[count - 1] == side:
+                # Same kind twice in a row: keep the more extreme pivot
+                if (side == 1 and value > price[count - 1]) or (side == -1 and value < price[count - 1]):
+                    index[count - 1] = i
+                    price[count - 1] = value
+                continue
+            if count > 0 and abs(value - price[count - 1]) < min_change * price[count - 1]:
+                continue
+            index[count] = i
+            kind[count] = side
+            price[count] = value
+            count += 1
+    return index[:count], kind[:count], price[:count]
+
+_zigzag_kernel = njit(cache=True)(_zigzag_loop) if HAVE_NUMBA else _zigzag_loop
+
+# Function to flag pivot highs/lows; a bar qualifies when it is the extreme of [i - left, i + right]
+def find_pivots(high, low, left=5, right=5):
+    high = np.ascontiguousarray(high, dtype=np.float64)
+    low = np.ascontiguousarray(low, dtype=np.float64)
+    n = high.shape[0]
+    span = left + right + 1
+    is_high = np.zeros(n, dtype=np.bool_)
+    is_low = np.zeros(n, dtype=np.bool_)
+    if n < span:
+        return is_high, is_low
+    # The rolling extreme ending at i + right covers the window centred on i
+    window_high = rolling_max(high, span)[span - 1:]
+    window_low = rolling_min(low, span)[span - 1:]
+    is_high[left:n - right] = high[left:n - right] == window_high
+    is_low[left:n - right] = low[left:n - right] == window_low
+    return is_high, is_low
+
+# Function to return alternating swing points: dict of arrays index, kind, price, confirmed_at
+def find_swings(high, low, left=5, right=5, min_change=0.0):
+    is_high, is_low = find_pivots(high, low, left, right)
+    index, kind, price = _zigzag_kernel(is_high, is_low, np.ascontiguousarray(high, dtype=np.float64),
+                                        np.ascontiguousarray(low, dtype=np.float64), float(min_change))
+    return {'index': index, 'kind': kind, 'price': price, 'confirmed_at': index + right}
+
+# Function to compute Fibonacci levels for every swing leg (pair of consecutive swings).
+# Levels use min + (max - min) * level, as calculate_fibonacci() does; shape (legs, len(levels)).
+def swing_fibonacci(swings, levels=fibonacci_levels):
+    price = swings['price']
+    if price.shape[0] < 2:
+        return {'start': np.empty(0, np.int64), 'end': np.empty(0, np.int64), 'confirmed_at': np.empty(0, np.int64),
+                'high': np.empty(0), 'low': np.empty(0), 'levels': np.empty((0, len(levels)))}
+    leg_high = np.maximum(price[:-1], price[1:])
+    leg_low = np.minimum(price[:-1], price[1:])
+    return {
+        'start': swings['index'][:-1], 'end': swings['index'][1:],
+        'confirmed_at': np.maximum(swings['confirmed_at'][:-1], swings['confirmed_at'][1:]),
+        'high': leg_high, 'low': leg_low,
+        'levels': leg_low[:, None] + (leg_high - leg_low)[:, None] * np.asarray(levels)[None, :],
+    }
+
+# Function to map every bar to the Fibonacci levels of the latest leg confirmed by that bar
+# (NaN before the first confirmed leg); shape (bars, len(levels))
+def levels_per_bar(legs, n_bars):
+    leg = np.searchsorted(legs['confirmed_at'], np.arange(n_bars), side='right') - 1
+    out = np.full((n_bars, legs['levels'].shape[1]), np.nan)
+    known = leg >= 0
+    out[known] = legs['levels'][leg[known]]
+    return out
+
+# Function to flag impulse waves per bar against the latest confirmed swing leg:
+# 1 impulse_up, -1 impulse_down, 0 none, with the same precedence as identify_impulse_wave
+def swing_impulse_signals(high, low, close, left=5, right=5, min_change=0.0, levels=fibonacci_levels):
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    per_bar = levels_per_bar(swing_fibonacci(find_swings(high, low, left, right, min_change), levels), close.shape[0])
+    levels = np.asarray(levels)
+    down = ((close[:, None] < per_bar) & (levels <= 0.382)[None, :]).any(axis=1)
+    up = ((close[:, None] > per_bar) & (levels >= 0.618)[None, :]).any(axis=1)
+    signals = np.zeros(close.shape[0], np.int8)
+    signals[up] = 1
+    signals[down] = -1
+    return signals
+
+# Swing/Fibonacci results cached per symbol, recomputed only when a new candle closes
+class SwingCache:
+    def __init__(self, left=5, right=5, min_change=0.0, levels=fibonacci_levels):
+        self.left = left
+        self.right = right
+        self.min_change = min_change
+        self.levels = list(levels)
+        self.cache = {}
+
+    # Function to return the latest confirmed swing leg as {'high', 'low', 'levels': {level: price}}, or None
+    def latest_leg(self, symbol, last_closed_ts, high, low):
+        cached = self.cache.get(symbol)
+        if cached is not None and cached[0] == last_closed_ts:
+            return cached[1]
+        legs = swing_fibonacci(find_swings(high, low, self.left, self.right, self.min_change), self.levels)
+        result = None
+        if legs['levels'].shape[0]:
+            result = {'high': float(legs['high'][-1]), 'low': float(legs['low'][-1]),
+                      'levels': dict(zip(self.levels, legs['levels'][-1].tolist()))}
+        self.cache[symbol] = (last_closed_ts, result)
+        return result
@@ -0,0 +1,208 @@
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import deque
+
+# Append-only journal of signals, order intents, acks and fills backed by SQLite in WAL mode.
+# Events are written by a background thread in batches (group commit); callers that must not
+# lose an event before talking to the exchange (order intents) can wait for it with sync=True,
+# which raises JournalWriteError if the batch holding the event could not be committed.
+
+class JournalWriteError(RuntimeError):
+    pass
+
+class TradeJournal:
+    def __init__(self, path='trade_journal.db', batch_size=64, flush_interval=0.05):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS events ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, ts REAL NOT NULL, kind TEXT NOT NULL, '
+            'symbol TEXT, payload TEXT NOT NULL)'
+        )
+        self.conn.commit()
+        self.pending = []
+        self.enqueued = 0
+        self.committed = 0
+        self.sync_waiters = 0
+        # (first seq, last seq, error) of recent batches that failed to commit
+        self.failures = deque(maxlen=256)
+        self.closed = False
+        self.cond = threading.Condition()
+        self.db_lock = threading.Lock()
+        self.writer = threading.Thread(target=self._writer_loop, name='trade-journal-writer', daemon=True)
+        self.writer.start()
+
+    # Function to append an event; with sync=True block until it is committed to disk
+    def record(self, kind, symbol=None, sync=False, **payload):
+        row = (time.time(), kind, symbol, json.dumps(payload, default=str))
+        with self.cond:
+            if self.closed:
+                raise RuntimeError("Trade journal is closed")
+            self.pending.append(row)
+            self.enqueued += 1
+            seq = self.enqueued
+            if sync:
+                self.sync_waiters += 1
+            self.cond.notify_all()
+            if sync:
+                while self.committed < seq:
+                    self.cond.wait()
+                self.sync_waiters -= 1
+                for first, last, error in self.failures:
+                    if first <= seq <= last:
+                        raise JournalWriteError(f"Journal write of {kind} event failed: {error}")
+        return seq
+
+    def _writer_loop(self):
+        while True:
+            with self.cond:
+                while not self.pending and not self.closed:
+                    self.cond.wait()
+                if not self.pending and self.closed:
+                    return
+                # Give other events a short window to join this commit unless someone is waiting on it
+                deadline = time.monotonic() + self.flush_interval
+                while (not self.closed and self.sync_waiters == 0 and len(self.pending) < self.batch_size):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+                batch, self.pending = self.pending, []
+            error = None
+            with self.db_lock:
+                try:
+                    self.conn.executemany('INSERT INTO events (ts, kind, symbol, payload) VALUES (?, ?, ?, ?)', batch)
+                    self.conn.commit()
+                except sqlite3.Error as e:
+                    error = e
+                    logging.error(f"Trade journal write of {len(batch)} events failed: {e}")
+                    try:
+                        self.conn.rollback()
+                    except sqlite3.Error:
+                        pass
+            with self.cond:
+                if error is not None:
+                    self.failures.append((self.committed + 1, self.committed + len(batch), error))
+                self.committed += len(batch)
+                self.cond.notify_all()
+
+    # Function to block until every event recorded so far is committed
+    def flush(self):
+        with self.cond:
+            target = self.enqueued
+            self.sync_waiters += 1
+            self.cond.notify_all()
+            while self.committed < target:
+                self.cond.wait()
+            self.sync_waiters -= 1
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        self.writer.join()
+        self.conn.close()
+
+    # Function to iterate over all journaled events in order
+    def events(self, since_id=0):
+        self.flush()
+        with self.db_lock:
+            rows = self.conn.execute(
+                'SELECT id, ts, kind, symbol, payload FROM events WHERE id > ? ORDER BY id', (since_id,)
+            ).fetchall()
+        for event_id, ts, kind, symbol, payload in rows:
+            yield {'id': event_id, 'ts': ts, 'kind': kind, 'symbol': symbol, **json.loads(payload)}
+
+    # Function to rebuild in-memory bot state by replaying the journal
+    def load_state(self):
+        trades = {}
+        state = {'trades': trades, 'cached_balance': None, 'last_balance_fetch_time': None}
+        for event in self.events():
+            kind, symbol = event['kind'], event['symbol']
+            if kind == 'balance':
+                state['cached_balance'] = event['balance']
+                state['last_balance_fetch_time'] = event['ts']
+            elif kind == 'entry_intent':
+                trades[symbol] = {
+                    'symbol': symbol, 'side': event['side'], 'amount': event['amount'],
+                    'entry_price': event['entry_price'], 'stop_loss_price': event['stop_loss_price'],
+                    'take_profit_price': event['take_profit_price'], 'intent_ts': event['ts'],
+                    'entry_order_id': None, 'protect_order_id': None, 'status': 'intent',
+                }
+            elif symbol not in trades:
+                continue
+            elif kind == 'entry_ack':
+                trades[symbol]['entry_order_id'] = event['order_id']
+                trades[symbol]['status'] = 'open'
+            elif kind == 'fill':
+                trades[symbol]['status'] = 'filled'
+                trades[symbol]['amount'] = event.get('amount', trades[symbol]['amount'])
+            elif kind == 'protect_ack':
+                trades[symbol]['protect_order_id'] = event['order_id']
+                trades[symbol]['status'] = 'protected'
+            elif kind in ('entry_failed', 'closed'):
+                del trades[symbol]
+        return state
+
+# Function to find an order placed for a journaled intent whose ack was never recorded
+def find_unacked_order(exchange, trade):
+    since = int(trade['intent_ts'] * 1000) - 60000
+    candidates = exchange.fetch_open_orders(trade['symbol'])
+    if exchange.has.get('fetchClosedOrders'):
+        candidates += exchange.fetch_closed_orders(trade['symbol'], since)
+    for order in candidates:
+        if order.get('side') == trade['side'] and abs((order.get('amount') or 0) - trade['amount']) <= 1e-12 * max(1, trade['amount']):
+            return order
+    return None
+
+# Function to reconcile journaled trades against the exchange after a restart
+def reconcile(exchange, journal):
+    state = journal.load_state()
+    unprotected = []
+    for symbol, trade in list(state['trades'].items()):
+        try:
+            if trade['entry_order_id'] is None:
+                order = find_unacked_order(exchange, trade)
+                if order is None:
+                    logging.warning(f"Journaled {trade['side']} intent on {symbol} never reached the exchange. Dropping it.")
+                    journal.record('entry_failed', symbol, reason='not found on exchange during recovery')
+                    del state['trades'][symbol]
+                    continue
+                trade['entry_order_id'] = order['id']
+                journal.record('entry_ack', symbol, order_id=order['id'], recovered=True)
+            if trade['protect_order_id'] is not None:
+                protect = exchange.fetch_order(trade['protect_order_id'], symbol)
+                if protect['status'] == 'closed':
+                    logging.info(f"Protective order on {symbol} executed while the bot was down. Trade closed.")
+                    journal.record('closed', symbol, reason='protective order executed')
+                    del state['trades'][symbol]
+                    continue
+                if protect['status'] == 'open':
+                    continue
+                trade['protect_order_id'] = None
+            entry = exchange.fetch_order(trade['entry_order_id'], symbol)
+            if entry['status'] == 'canceled' and not entry.get('filled'):
+                journal.record('closed', symbol, reason='entry canceled without fill')
+                del state['trades'][symbol]
+                continue
+            unprotected.append(trade)
+        except Exception as e:
+            # Keep the trade so the bot does not open a second position on top of an unknown one
+            logging.error(f"Reconciliation of {symbol} failed: {e}")
+    if exchange.has.get('fetchPositions'):
+        try:
+            for position in exchange.fetch_positions():
+                if position.get('contracts') and position['symbol'] not in state['trades']:
+                    logging.warning(f"Exchange reports a {position['symbol']} position that is not in the journal.")
+        except Exception as e:
+            logging.error(f"Error fetching positions during reconciliation: {e}")
+    journal.record('reconciled', open_trades=list(state['trades']), unprotected=[t['symbol'] for t in unprotected])
+    state['unprotected'] = unprotected
+    return state
@@ -0,0 +1,160 @@
+import logging
+import threading
+
+# Trailing stop engine for all open positions. Stops are ratcheted in memory on every price
+# update; the exchange stop order is only replaced when the stop has moved by more than
+# amend_threshold_pct, which keeps the order-amend API rate low across many positions.
+# Without editOrder the amend is cancel + create; if the create fails the stop is re-placed
+# at its previous level, and a position left with no stop order is retried on every update.
+
+class TrailingStopManager:
+    def __init__(self, exchange, trail_pct=0.01, atr_multiplier=None, amend_threshold_pct=0.002, poll_interval=5):
+        self.exchange = exchange
+        self.trail_pct = trail_pct
+        self.atr_multiplier = atr_multiplier
+        self.amend_threshold_pct = amend_threshold_pct
+        self.poll_interval = poll_interval
+        self.positions = {}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    # Function to start trailing a position; with no stop_order_id the stop order is placed on the next price update
+    def add_position(self, symbol, side, amount, entry_price, stop_price, take_profit_price, stop_order_id, atr=None):
+        with self.lock:
+            self.positions[symbol] = {
+                'symbol': symbol, 'side': side, 'amount': amount, 'entry_price': entry_price,
+                'best_price': entry_price, 'stop_price': stop_price, 'exchange_stop_price': stop_price,
+                'take_profit_price': take_profit_price, 'stop_order_id': stop_order_id, 'atr': atr,
+            }
+        logging.info(f"Trailing stop armed on {symbol} ({side}) at {stop_price}")
+
+    def remove_position(self, symbol):
+        with self.lock:
+            return self.positions.pop(symbol, None)
+
+    # Function to refresh the ATR used for ATR-based trailing distance
+    def update_atr(self, symbol, atr):
+        with self.lock:
+            if symbol in self.positions:
+                self.positions[symbol]['atr'] = atr
+
+    def _trail_distance(self, position):
+        if self.atr_multiplier is not None and position['atr']:
+            return position['atr'] * self.atr_multiplier
+        return position['best_price'] * self.trail_pct
+
+    # Function to feed a new price for a symbol; returns the current in-memory stop or None
+    def on_price(self, symbol, price):
+        with self.lock:
+            position = self.positions.get(symbol)
+            if position is None or price is None:
+                return None
+            if position['side'] == 'buy':
+                if price <= position['stop_price']:
+                    logging.info(f"{symbol} traded through trailing stop {position['stop_price']}. Releasing position.")
+                    del self.positions[symbol]
+                    return None
+                position['best_price'] = max(position['best_price'], price)
+                candidate = position['best_price'] - self._trail_distance(position)
+                if candidate > position['stop_price']:
+                    position['stop_price'] = candidate
+            else:
+                if price >= position['stop_price']:
+                    logging.info(f"{symbol} traded through trailing stop {position['stop_price']}. Releasing position.")
+                    del self.positions[symbol]
+                    return None
+                position['best_price'] = min(position['best_price'], price)
+                candidate = position['best_price'] + self._trail_distance(position)
+                if candidate < position['stop_price']:
+                    position['stop_price'] = candidate
+            moved = abs(position['stop_price'] - position['exchange_stop_price']) / price
+            unprotected = position['stop_order_id'] is None
+            needs_amend = (moved >= self.amend_threshold_pct or unprotected) and not position.get('amending')
+            if needs_amend:
+                position['amending'] = True  # Only one thread replaces the exchange order at a time
+            stop_price = position['stop_price']
+        if needs_amend:
+            self._amend_stop(symbol)
+        return stop_price
+
+    def _amend_stop(self, symbol):
+        with self.lock:
+            position = self.positions.get(symbol)
+            if position is None:
+                return
+            position = dict(position)
+        exit_side = 'sell' if position['side'] == 'buy' else 'buy'
+        try:
+            if self.exchange.has.get('editOrder') and position['stop_order_id'] is not None:
+                order = self.exchange.edit_order(position['stop_order_id'], symbol, 'limit', exit_side, position['amount'],
+                                                 position['take_profit_price'], {'stopPrice': position['stop_price']})
+                self._amended(symbol, order['id'], position['stop_price'])
+                return
+            if position['stop_order_id'] is not None:
+                self.exchange.cancel_order(position['stop_order_id'], symbol)
+        except Exception as e:
+            # The old stop order is still live, so the position stays protected at its previous level
+            logging.error(f"Failed to move stop on {symbol} to {position['stop_price']}: {e}")
+            self._amended(symbol, position['stop_order_id'], position['exchange_stop_price'])
+            return
+        for stop_price in dict.fromkeys((position['stop_price'], position['exchange_stop_price'])):
+            try:
+                order = self.exchange.create_order(symbol, 'limit', exit_side, position['amount'],
+                                                   position['take_profit_price'], {'stopPrice': stop_price})
+            except Exception as e:
+                logging.error(f"Failed to place stop on {symbol} at {stop_price}: {e}")
+                continue
+            self._amended(symbol, order['id'], stop_price)
+            if stop_price != position['stop_price']:
+                logging.warning(f"Stop on {symbol} re-placed at its previous level {stop_price}.")
+            return
+        logging.critical(f"Position on {symbol} has no stop order; retrying on the next price update.")
+        self._amended(symbol, None, position['exchange_stop_price'])
+
+    # Function to record the stop order now live on the exchange (None if there is none)
+    def _amended(self, symbol, order_id, stop_price):
+        with self.lock:
+            position = self.positions.get(symbol)
+            if position is None:
+                return
+            if order_id is not None and stop_price != position['exchange_stop_price']:
+                logging.info(f"Stop on {symbol} moved from {position['exchange_stop_price']} to {stop_price}")
+            position['stop_order_id'] = order_id
+            position['exchange_stop_price'] = stop_price
+            position['amending'] = False
+
+    # Function to fetch last prices for every open position with a single tickers request
+    def fetch_prices(self, symbols):
+        if self.exchange.has.get('fetchTickers'):
+            tickers = self.exchange.fetch_tickers(symbols)
+        else:
+            tickers = {symbol: self.exchange.fetch_ticker(symbol) for symbol in symbols}
+        return {symbol: ticker['last'] for symbol, ticker in tickers.items()}
+
+    def _run(self, price_source):
+        while not self.stop_event.is_set():
+            with self.lock:
+                symbols = list(self.positions)
+            if symbols:
+                try:
+                    for symbol, price in price_source(symbols).items():
+                        self.on_price(symbol, price)
+                except Exception as e:
+                    logging.error(f"Trailing stop price update failed: {e}")
+            self.stop_event.wait(self.poll_interval)
+
+    # Function to run the manager in a background thread; price_source(symbols) -> {symbol: price}
+    # can be a shared ticker/candle feed, otherwise one batched tickers request per poll is used.
+    def start(self, price_source=None):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, args=(price_source or self.fetch_prices,),
+                                       name='trailing-stops', daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=None):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout)